@@ -2,7 +2,7 @@ import os
 from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse, JSONResponse
 from dotenv import load_dotenv
-import httpx
+from app.canvas_api import canvas, auth_headers
 
 load_dotenv()
 
@@ -31,17 +31,16 @@ async def canvas_callback(request: Request, code: str):
     """Exchange Canvas OAuth code for an access token and return user info."""
     token_url = f"{CANVAS_BASE}/login/oauth2/token"
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            token_url,
-            data={
-                "grant_type": "authorization_code",
-                "client_id": CLIENT_ID,
-                "client_secret": CLIENT_SECRET,
-                "redirect_uri": REDIRECT_URI,
-                "code": code,
-            },
-        )
+    response = await canvas.post(
+        token_url,
+        data={
+            "grant_type": "authorization_code",
+            "client_id": CLIENT_ID,
+            "client_secret": CLIENT_SECRET,
+            "redirect_uri": REDIRECT_URI,
+            "code": code,
+        },
+    )
 
     if response.status_code != 200:
         return JSONResponse(status_code=400, content={"error": "Failed to get access token"})
@@ -49,11 +48,10 @@ async def canvas_callback(request: Request, code: str):
     token_data = response.json()
     access_token = token_data.get("access_token")
 
-    async with httpx.AsyncClient() as client:
-        user_resp = await client.get(
-            f"{CANVAS_BASE}/api/v1/users/self",
-            headers={"Authorization": f"Bearer {access_token}"},
-        )
+    user_resp = await canvas.get(
+        f"{CANVAS_BASE}/api/v1/users/self",
+        headers=auth_headers(access_token),
+    )
 
     user_info = user_resp.json()
     return {
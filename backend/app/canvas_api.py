@@ -1,39 +1,160 @@
 import os
+import time
+import hashlib
+import asyncio
 import httpx
 from dotenv import load_dotenv
+from app.utils.metrics import span, inc
+from app.utils.response_cache import ResponseCache, NOT_MODIFIED
 
 load_dotenv()
 
 BASE_URL = os.getenv("CANVAS_BASE_URL")
 ACCESS_TOKEN = os.getenv("CANVAS_ACCESS_TOKEN")
 
+CANVAS_CONCURRENCY = int(os.getenv("CANVAS_CONCURRENCY", "8"))
+CANVAS_MAX_CONNECTIONS = int(os.getenv("CANVAS_MAX_CONNECTIONS", "20"))
+CANVAS_TIMEOUT = float(os.getenv("CANVAS_TIMEOUT", "30"))
+# Canvas throttles per token with a leaky bucket (~700 units). Below this many
+# remaining units we start pausing requests proportionally.
+CANVAS_RATE_LIMIT_FLOOR = float(os.getenv("CANVAS_RATE_LIMIT_FLOOR", "100"))
+CANVAS_BACKOFF = float(os.getenv("CANVAS_BACKOFF", "1.0"))
+CANVAS_MAX_RETRIES = int(os.getenv("CANVAS_MAX_RETRIES", "3"))
+# Profile and course list responses are served from memory for CANVAS_CACHE_TTL
+# seconds, then stale (while refreshing in the background) for CANVAS_CACHE_STALE more
+CANVAS_CACHE_TTL = float(os.getenv("CANVAS_CACHE_TTL", "60"))
+CANVAS_CACHE_STALE = float(os.getenv("CANVAS_CACHE_STALE", "600"))
+# Entries are keyed per access token; beyond this many, the least recently used are evicted
+CANVAS_CACHE_MAX_ENTRIES = int(os.getenv("CANVAS_CACHE_MAX_ENTRIES", "1000"))
 
-async def get_user_profile():
+
+class CanvasClient:
+    """
+    Application-lifetime HTTP client for Canvas: one keep-alive connection pool,
+    a cap on in-flight requests, and backoff driven by X-Rate-Limit-Remaining.
+    """
+
+    def __init__(self, concurrency: int, max_connections: int, timeout: float, transport=None):
+        self.concurrency = concurrency
+        self.max_connections = max_connections
+        self.timeout = timeout
+        # Custom httpx transport (e.g. httpx.MockTransport in the benchmarks)
+        self.transport = transport
+        self._http = None
+        self._semaphore = None
+        self._resume_at = 0.0
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=self.transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._http
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        http = self.http
+        for attempt in range(CANVAS_MAX_RETRIES + 1):
+            delay = self._resume_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            async with self._semaphore:
+                with span("canvas.request"):
+                    response = await http.request(method, url, **kwargs)
+            inc("canvas_requests", status=str(response.status_code))
+            inc("canvas_response_bytes", len(response.content))
+            self._record_rate_limit(response)
+
+            if not self._is_throttled(response) or attempt == CANVAS_MAX_RETRIES:
+                return response
+            await asyncio.sleep(CANVAS_BACKOFF * 2 ** attempt)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def _record_rate_limit(self, response: httpx.Response):
+        remaining = response.headers.get("X-Rate-Limit-Remaining")
+        if remaining is None:
+            return
+        remaining = float(remaining)
+        if remaining < CANVAS_RATE_LIMIT_FLOOR:
+            # The bucket refills continuously; the emptier it is, the longer we pause
+            delay = CANVAS_BACKOFF * (1 - remaining / CANVAS_RATE_LIMIT_FLOOR)
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+    @staticmethod
+    def _is_throttled(response: httpx.Response) -> bool:
+        if response.status_code == 429:
+            return True
+        return response.status_code == 403 and "Rate Limit Exceeded" in response.text
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+canvas = CanvasClient(CANVAS_CONCURRENCY, CANVAS_MAX_CONNECTIONS, CANVAS_TIMEOUT)
+
+
+def auth_headers(access_token: str = None) -> dict:
+    return {"Authorization": f"Bearer {access_token or ACCESS_TOKEN}"}
+
+
+def _user_key(access_token: str = None) -> str:
+    # Responses are per user, and the token is what identifies the user
+    return hashlib.sha256((access_token or ACCESS_TOKEN or "").encode()).hexdigest()
+
+
+async def conditional_get(url: str, access_token: str = None, etag: str = None):
+    """GET with If-None-Match; returns (json, etag), or NOT_MODIFIED on a 304"""
+    headers = auth_headers(access_token)
+    if etag:
+        headers["If-None-Match"] = etag
+    res = await canvas.get(url, headers=headers)
+    if res.status_code == 304:
+        return NOT_MODIFIED
+    res.raise_for_status()
+    return res.json(), res.headers.get("ETag")
+
+
+profile_cache = ResponseCache("profile", CANVAS_CACHE_TTL, CANVAS_CACHE_STALE, CANVAS_CACHE_MAX_ENTRIES)
+courses_cache = ResponseCache("courses", CANVAS_CACHE_TTL, CANVAS_CACHE_STALE, CANVAS_CACHE_MAX_ENTRIES)
+
+
+async def get_user_profile(access_token: str = None):
     """Fetch the authenticated user's Canvas profile information."""
-    async with httpx.AsyncClient() as client:
-        res = await client.get(
-            f"{BASE_URL}/api/v1/users/self",
-            headers={"Authorization": f"Bearer {ACCESS_TOKEN}"}
-        )
-        res.raise_for_status()
-        return res.json()
+    async def fetch(etag):
+        return await conditional_get(f"{BASE_URL}/api/v1/users/self", access_token, etag)
+
+    return await profile_cache.get(_user_key(access_token), fetch)
 
 
-async def get_courses():
+async def get_courses(access_token: str = None):
     """
     Return the user's favorite (starred) Canvas courses,
     as shown on their Canvas dashboard.
     """
-    async with httpx.AsyncClient() as client:
-        res = await client.get(
-            f"{BASE_URL}/api/v1/users/self/favorites/courses",
-            headers={"Authorization": f"Bearer {ACCESS_TOKEN}"}
+    async def fetch(etag):
+        result = await conditional_get(f"{BASE_URL}/api/v1/users/self/favorites/courses", access_token, etag)
+        if result is NOT_MODIFIED:
+            return result
+        favorite_courses, etag = result
+        # Sorted once per fetch; cache hits return the sorted list as is
+        favorite_courses.sort(
+            key=lambda c: c.get("term", {}).get("name", ""),
+            reverse=True
         )
-        res.raise_for_status()
-        favorite_courses = res.json()
-
-    favorite_courses.sort(
-        key=lambda c: c.get("term", {}).get("name", ""),
-        reverse=True
-    )
-    return favorite_courses
+        return favorite_courses, etag
+
+    return await courses_cache.get(_user_key(access_token), fetch)
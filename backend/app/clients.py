@@ -0,0 +1,81 @@
+import os
+from dotenv import load_dotenv
+from app.canvas_api import canvas
+from app.utils.memory_store import memory_store
+from app.utils.executor import run_blocking
+
+load_dotenv()
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+
+class Clients:
+    """
+    The process's shared API clients: OpenAI, Canvas, the memory store and the
+    vector store. Nothing connects at import or startup: each client is built
+    on first use and reuses its connection pool for the life of the app, and
+    `aclose()` closes them all and returns the registry to that unbuilt state.
+    The FastAPI lifespan does so on startup and shutdown, so each app run owns
+    a fresh set. Assign an attribute to swap in another client (e.g. the
+    benchmark fakes).
+    """
+
+    def __init__(self):
+        self._openai = None
+        self._openai_sync = None
+        self._vector_store = None
+        self.canvas = canvas
+        self.memory_store = memory_store
+
+    @property
+    def openai(self):
+        """AsyncOpenAI, shared by chat and ingest"""
+        if self._openai is None:
+            from openai import AsyncOpenAI
+            self._openai = AsyncOpenAI(api_key=OPENAI_API_KEY)
+        return self._openai
+
+    @openai.setter
+    def openai(self, client):
+        self._openai = client
+
+    @property
+    def openai_sync(self):
+        """Blocking OpenAI client for the synchronous vector-store helpers"""
+        if self._openai_sync is None:
+            from openai import OpenAI
+            self._openai_sync = OpenAI(api_key=OPENAI_API_KEY)
+        return self._openai_sync
+
+    @openai_sync.setter
+    def openai_sync(self, client):
+        self._openai_sync = client
+
+    @property
+    def vector_store(self):
+        """Pinecone or local vector index, per VECTOR_BACKEND"""
+        if self._vector_store is None:
+            # Imported here: vector_store imports this registry for its sync OpenAI client
+            from app.utils.vector_store import create_vector_store
+            self._vector_store = create_vector_store()
+        return self._vector_store
+
+    @vector_store.setter
+    def vector_store(self, store):
+        self._vector_store = store
+
+    async def aclose(self):
+        # Fakes swapped in by the benchmarks have no close()
+        if self._openai is not None and hasattr(self._openai, "close"):
+            await self._openai.close()
+        if self._openai_sync is not None and hasattr(self._openai_sync, "close"):
+            self._openai_sync.close()
+        self._openai = self._openai_sync = None
+        if self._vector_store is not None and hasattr(self._vector_store, "close"):
+            await run_blocking(self._vector_store.close)
+        self._vector_store = None
+        await self.canvas.aclose()
+        await self.memory_store.aclose()
+
+
+clients = Clients()
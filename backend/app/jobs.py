@@ -0,0 +1,228 @@
+import os
+import time
+import uuid
+import asyncio
+import traceback
+from collections import OrderedDict
+from contextlib import AsyncExitStack
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks, so every process runs its schedule
+    fcntl = None
+
+
+class Job:
+    """One queued unit of background work and its live progress"""
+
+    def __init__(self, key, params: dict, run, locks: list):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.run = run
+        self.locks = locks
+        self.status = "queued"
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def as_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        progress, throughput = {}, {}
+        for name, value in self.progress.items():
+            if hasattr(value, "as_dict"):
+                value = value.as_dict()
+                if elapsed:
+                    throughput[f"{name}_per_second"] = round(value["items"] / elapsed, 2)
+            progress[name] = value
+        return {
+            "id": self.id,
+            "key": self.key,
+            "params": self.params,
+            "status": self.status,
+            "progress": progress,
+            "throughput": throughput,
+            "elapsed_seconds": round(elapsed, 3),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    In-process job queue with a fixed worker pool.
+
+    Jobs are deduplicated by key: submitting a key that already has a queued or
+    running job returns that job. A job holds `lock(k)` for each of its lock
+    keys (default: its own key) while it runs, which also serializes other
+    writers such as namespace deletes.
+    `run(progress=dict, **params)` is awaited for each job (the queue's default
+    runner unless the job has its own); it may update the progress dict in
+    place while it runs.
+    """
+
+    def __init__(self, run, workers: int, history: int = 200):
+        self.run = run
+        self.workers = workers
+        self.history = history
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._locks = {}
+        self._queue = None
+        self._tasks = []
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def lock(self, key) -> asyncio.Lock:
+        return self._locks.setdefault(key, asyncio.Lock())
+
+    def submit(self, key, run=None, locks=None, **params) -> Job:
+        self._ensure_started()
+        existing = self._active.get(key)
+        if existing is not None and existing.active:
+            return existing
+
+        job = Job(key, params, run or self.run, sorted(locks) if locks else [key])
+        self._jobs[job.id] = job
+        self._active[key] = job
+        self._queue.put_nowait(job)
+        self._prune()
+        return job
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def list(self):
+        return list(self._jobs.values())
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            async with AsyncExitStack() as stack:
+                # Locks are taken in sorted order so overlapping jobs can't deadlock
+                for key in job.locks:
+                    await stack.enter_async_context(self.lock(key))
+                job.status = "running"
+                job.started_at = time.time()
+                try:
+                    job.result = await job.run(progress=job.progress, **job.params)
+                    job.status = "succeeded"
+                except asyncio.CancelledError:
+                    job.status = "cancelled"
+                    raise
+                except Exception as e:
+                    traceback.print_exc()
+                    job.status = "failed"
+                    job.error = getattr(e, "detail", None) or str(e)
+                finally:
+                    job.finished_at = time.time()
+                    if self._active.get(job.key) is job:
+                        del self._active[job.key]
+                    self._queue.task_done()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+
+class Scheduler:
+    """
+    Awaits `tick(n)` every `interval` seconds in the background (n counts the
+    ticks from 0). A failing tick is logged and the schedule carries on.
+    With `lock_file`, only the process holding an exclusive lock on it ticks,
+    so several workers sharing DATA_DIR run one schedule; the others keep
+    trying and take over if the holder exits.
+    """
+
+    def __init__(self, tick, interval: float, lock_file: str = None):
+        self.tick = tick
+        self.interval = interval
+        self.lock_file = lock_file
+        self.ticks = 0
+        self.last_tick_at = None
+        self.last_error = None
+        self._task = None
+        self._lock = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    @property
+    def leader(self) -> bool:
+        return self.lock_file is None or fcntl is None or self._lock is not None
+
+    def _acquire(self) -> bool:
+        if self.leader:
+            return True
+        os.makedirs(os.path.dirname(self.lock_file) or ".", exist_ok=True)
+        lock = open(self.lock_file, "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        self._lock = lock
+        return True
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self._acquire():
+                continue
+            self.last_tick_at = time.time()
+            try:
+                await self.tick(self.ticks)
+                self.last_error = None
+            except Exception as e:
+                traceback.print_exc()
+                self.last_error = str(e)
+            self.ticks += 1
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._lock is not None:
+            # Closing releases the lock for another worker to pick up
+            self._lock.close()
+            self._lock = None
+
+    def as_dict(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None,
+            "leader": self.leader,
+            "interval_seconds": self.interval,
+            "ticks": self.ticks,
+            "last_tick_at": self.last_tick_at,
+            "next_tick_at": self.last_tick_at + self.interval if self.last_tick_at and self._task else None,
+            "last_error": self.last_error,
+        }
@@ -1,25 +1,39 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import os, traceback, re, json
+import os, traceback, re, json, asyncio, time
 from datetime import datetime
-from openai import OpenAI
-from pinecone import Pinecone
-from upstash_redis import Redis
 from dotenv import load_dotenv
+from app.clients import clients
+from app.utils.vector_store import EMBEDDING_PROFILE, EMBEDDING_REQUEST
+from app.utils.memory_store import memory_store
+from app.utils.embedding_cache import embedding_cache
+from app.utils.embedding_batcher import EmbeddingBatcher, QUERY_EMBED_WINDOW_MS, QUERY_EMBED_MAX_BATCH
+from app.utils.answer_cache import answer_cache
+from app.utils.bm25 import lexical_search, reciprocal_rank_fusion
+from app.utils.content_store import hydrate
+from app.utils.tokens import count_tokens, count_embedding_tokens, count_message_tokens
+from app.utils.metrics import span, inc, observe
+from app.utils.context import CONTEXT_TOKEN_BUDGET, HISTORY_MESSAGES, merge_overlapping, pack, trim_history
+from app.utils.deadlines import parse_date_range, is_indexed, events_between
+from app.utils.executor import run_blocking
 
 load_dotenv()  # Load environment variables safely
 
 router = APIRouter()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-# --- Pinecone setup ---
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX = os.getenv("PINECONE_INDEX")
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX)
+# --- Retrieval sizes: dense and BM25 hits are fused, so each list can stay short ---
+VECTOR_TOP_K = int(os.getenv("VECTOR_TOP_K", "10"))
+LEXICAL_TOP_K = int(os.getenv("LEXICAL_TOP_K", "10"))
+FUSED_TOP_K = int(os.getenv("FUSED_TOP_K", "12"))
+INTENT_TOP_K = int(os.getenv("INTENT_TOP_K", "6"))
 
-# --- Upstash Redis setup ---
-redis_client = Redis.from_env()
+# --- Session memory (Upstash, pooled Redis or in-process; see MEMORY_BACKEND) ---
+# History is a capped Redis list of JSON messages; with summaries enabled, the
+# messages that fall off the cap are folded into a rolling summary instead of lost
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", str(HISTORY_MESSAGES)))
+CHAT_HISTORY_TTL = int(os.getenv("CHAT_HISTORY_TTL", "1800"))  # 30 minutes
+CHAT_HISTORY_SUMMARY = os.getenv("CHAT_HISTORY_SUMMARY", "0") == "1"
 
 # --- Request model ---
 class ChatRequest(BaseModel):
@@ -30,26 +44,88 @@ class ChatRequest(BaseModel):
 
 # --- Redis helper functions ---
 def get_memory_key(course_id: int, session_id: str):
-    return f"chat:{course_id}:{session_id}"
+    return f"chat:{course_id}:{session_id}:log"
 
 
-def get_chat_history(course_id: int, session_id: str):
-    key = get_memory_key(course_id, session_id)
-    history_json = redis_client.get(key)
-    if history_json:
-        return json.loads(history_json)
-    return []
+def get_summary_key(course_id: int, session_id: str):
+    return f"chat:{course_id}:{session_id}:summary"
 
 
-def save_chat_history(course_id: int, session_id: str, history):
+async def get_chat_history(course_id: int, session_id: str):
+    """
+    Last HISTORY_MESSAGES messages, preceded by a system message holding the
+    summary of older turns when there is one. One round trip either way.
+    """
+    key = get_memory_key(course_id, session_id)
+    if not CHAT_HISTORY_SUMMARY:
+        entries, summary = await memory_store.lrange(key, -HISTORY_MESSAGES, -1), None
+    else:
+        pipe = memory_store.pipeline()
+        pipe.lrange(key, -HISTORY_MESSAGES, -1)
+        pipe.get(get_summary_key(course_id, session_id))
+        entries, summary = await pipe.exec()
+
+    history = [json.loads(entry) for entry in entries or []]
+    if summary:
+        history.insert(0, {"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+    return history
+
+
+async def append_chat_history(course_id: int, session_id: str, messages: list[dict]):
+    """
+    Append messages, cap the list and refresh its TTL in one pipelined round
+    trip. Returns the messages trimmed off the front (only fetched when
+    summaries are enabled).
+    """
     key = get_memory_key(course_id, session_id)
-    redis_client.set(key, json.dumps(history), ex=1800)  # Expires after 30 minutes
+    pipe = memory_store.pipeline()
+    pipe.rpush(key, *(json.dumps(m) for m in messages))
+    if CHAT_HISTORY_SUMMARY:
+        # Runs before the trim, so it returns exactly what is about to be dropped
+        pipe.lrange(key, 0, -(CHAT_HISTORY_MAX_MESSAGES + 1))
+    pipe.ltrim(key, -CHAT_HISTORY_MAX_MESSAGES, -1)
+    pipe.expire(key, CHAT_HISTORY_TTL)
+    if CHAT_HISTORY_SUMMARY:
+        pipe.expire(get_summary_key(course_id, session_id), CHAT_HISTORY_TTL)
+    results = await pipe.exec()
+    return [json.loads(entry) for entry in results[1] or []] if CHAT_HISTORY_SUMMARY else []
+
+
+async def summarize_history(course_id: int, session_id: str, dropped: list[dict]):
+    """Fold messages that fell off the capped history into the session's rolling summary"""
+    summary_key = get_summary_key(course_id, session_id)
+    previous = await memory_store.get(summary_key)
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in dropped)
+    response = await clients.openai.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": "Update the running summary of a student's conversation with a course "
+                                          "assistant. Keep names, dates and open questions; at most 120 words."},
+            {"role": "user", "content": f"Current summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"},
+        ],
+        max_tokens=200,
+        temperature=0,
+    )
+    await memory_store.set(summary_key, response.choices[0].message.content.strip(), ex=CHAT_HISTORY_TTL)
+
+
+# Keeps fire-and-forget summary tasks referenced until they finish
+_background_tasks = set()
+
+
+# Fallback for vectors ingested before due dates were indexed as structured metadata
+_ISO_DUE_RE = re.compile(r"Due:\s*(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z)")
+_READABLE_DUE_RES = [
+    re.compile(r"[Dd]ue[:\s]+([A-Za-z]+\s+\d{1,2},?\s+\d{4})"),
+    re.compile(r"[Dd]ue\s+[Dd]ate[:\s]+([A-Za-z]+\s+\d{1,2},?\s+\d{4})"),
+    re.compile(r"[Dd]eadline[:\s]+([A-Za-z]+\s+\d{1,2},?\s+\d{4})"),
+    re.compile(r"[Ss]ubmit\s+by[:\s]+([A-Za-z]+\s+\d{1,2},?\s+\d{4})"),
+]
 
 
 def parse_date_from_text(text: str):
     """Extract and parse possible due dates from course text"""
-    iso_pattern = r"Due:\s*(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z)"
-    match = re.search(iso_pattern, text)
+    match = _ISO_DUE_RE.search(text)
     if match:
         try:
             date_str = match.group(1)
@@ -58,15 +134,8 @@ def parse_date_from_text(text: str):
         except Exception:
             pass
 
-    readable_patterns = [
-        r"[Dd]ue[:\s]+([A-Za-z]+\s+\d{1,2},?\s+\d{4})",
-        r"[Dd]ue\s+[Dd]ate[:\s]+([A-Za-z]+\s+\d{1,2},?\s+\d{4})",
-        r"[Dd]eadline[:\s]+([A-Za-z]+\s+\d{1,2},?\s+\d{4})",
-        r"[Ss]ubmit\s+by[:\s]+([A-Za-z]+\s+\d{1,2},?\s+\d{4})",
-    ]
-
-    for pattern in readable_patterns:
-        match = re.search(pattern, text)
+    for pattern in _READABLE_DUE_RES:
+        match = pattern.search(text)
         if match:
             try:
                 date_str = match.group(1).replace(",", "").strip()
@@ -79,102 +148,393 @@ def parse_date_from_text(text: str):
     return None
 
 
-@router.post("/chat")
-async def chat_with_canvas(req: ChatRequest):
-    """Main chat endpoint: retrieves context, queries Pinecone, and responds via OpenAI"""
-    try:
-        history = get_chat_history(req.course_id, req.session_id)
-        recent_messages = [{"role": h["role"], "content": h["content"]} for h in history[-5:]]
-
-        emb = client.embeddings.create(
-            model="text-embedding-3-large",
-            input=req.message
-        ).data[0].embedding
-
-        namespace = f"course_{req.course_id}"
-        search = index.query(
-            vector=emb,
-            top_k=20,
-            include_metadata=True,
-            namespace=namespace
-        )
-
-        matches = search.get("matches", [])
-        if not matches:
-            return {"answer": "I couldn't find relevant data for this course."}
-
-        assignments, announcements, other_context = [], [], []
-        today = datetime.now()
-
-        for m in matches:
-            text = m["metadata"]["text"]
-            score = m.get("score", 0)
-            due_date = parse_date_from_text(text)
-
-            is_assignment = text.startswith("Assignment:")
-            is_announcement = text.startswith("Announcement:")
-
-            if is_assignment and due_date and due_date >= today:
-                assignments.append({'date': due_date, 'text': text, 'score': score})
-            elif is_announcement:
-                announcements.append({'text': text, 'score': score, 'date': due_date})
-            else:
-                other_context.append({'text': text, 'score': score})
-
-        assignments.sort(key=lambda x: x['date'])
-
-        context_parts = []
-        if assignments:
-            context_parts.append("=== UPCOMING ASSIGNMENTS ===")
-            for i, a in enumerate(assignments, 1):
-                date_str = a['date'].strftime("%B %d, %Y")
-                context_parts.append(f"[Assignment {i}] Due: {date_str}\n{a['text']}")
-        if announcements:
-            announcements.sort(key=lambda x: x['score'], reverse=True)
-            context_parts.append("\n\n=== RECENT ANNOUNCEMENTS ===")
-            for ann in announcements[:5]:
-                context_parts.append(ann['text'])
-        if other_context:
-            other_context.sort(key=lambda x: x['score'], reverse=True)
-            context_parts.append("\n\n=== ADDITIONAL COURSE INFORMATION ===")
-            for ctx in other_context[:3]:
-                context_parts.append(ctx['text'])
-        context = "\n\n".join(context_parts) or "No relevant course data found."
-
-        today_str = today.strftime("%B %d, %Y")
-        system_prompt = f"""You are an advanced Canvas academic assistant with access to course materials.
+def match_date(metadata: dict):
+    """Due (or posted) date of a match: structured metadata first, text parsing only as a fallback"""
+    value = metadata.get("due_date") or metadata.get("posted_date")
+    if value:
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+        except ValueError:
+            pass
+    return parse_date_from_text(metadata["text"])
+
+
+NO_DATA_ANSWER = "I couldn't find relevant data for this course."
+
+
+async def embed_questions(texts: list[str]) -> list[list[float]]:
+    emb_response = await clients.openai.embeddings.create(
+        input=texts,
+        **EMBEDDING_REQUEST
+    )
+    inc("embedding_tokens", sum(count_embedding_tokens(t) for t in texts), source="query")
+    return [emb_data.embedding for emb_data in emb_response.data]
+
+
+# Questions arriving together share one embeddings request
+query_embedder = EmbeddingBatcher(embed_questions, QUERY_EMBED_WINDOW_MS / 1000, QUERY_EMBED_MAX_BATCH)
+
+
+async def embed_query(text: str) -> list[float]:
+    """Embed a chat question, reusing cached embeddings for repeated questions"""
+    cached = await embedding_cache.aget(EMBEDDING_PROFILE, text)
+    if cached is not None:
+        return cached
+    emb = await query_embedder.embed(text)
+    await embedding_cache.aput(EMBEDDING_PROFILE, text, emb)
+    return emb
+
+
+# --- Query planning: route each intent to its own metadata-filtered query ---
+_INTENT_RES = [
+    ("assignment", re.compile(r"\b(due|deadlines?|assignments?|homework|hw|submit\w*|projects?|quiz\w*|labs?)\b", re.I)),
+    ("announcement", re.compile(r"\b(announce\w*|posted|news|updates?)\b", re.I)),
+    ("person", re.compile(r"\b(instructor|professor|prof|teacher|ta|tas|email|contact|office hours)\b", re.I)),
+    ("syllabus", re.compile(r"\b(syllabus|grading|grades?|polic\w*|late|attendance|weights?|textbook)\b", re.I)),
+]
+
+
+def plan_queries(message: str, now: datetime = None):
+    """
+    Map a question to [(filter, top_k)]. Each detected intent gets a filtered
+    query (assignments restricted to ones still due); an unfiltered query is
+    always included so chunks of other types can still surface.
+    """
+    now = now or datetime.now()
+    plan = []
+    for intent, pattern in _INTENT_RES:
+        if not pattern.search(message):
+            continue
+        if intent == "assignment":
+            metadata_filter = {"type": {"$eq": "assignment"}, "due_ts": {"$gte": int(now.timestamp())}}
+        else:
+            metadata_filter = {"type": {"$eq": intent}}
+        plan.append((metadata_filter, INTENT_TOP_K))
+    plan.append((None, VECTOR_TOP_K if not plan else INTENT_TOP_K))
+    return plan
+
+
+async def retrieve_matches(req: ChatRequest, emb, lexical_matches):
+    """Run the planned filtered queries concurrently and fuse them with the BM25 hits by reciprocal rank"""
+    namespace = f"course_{req.course_id}"
+    plan = plan_queries(req.message)
+    with span("chat.vector_query"):
+        searches = await asyncio.gather(*(
+            clients.vector_store.aquery(
+                vector=emb,
+                top_k=top_k,
+                include_metadata=True,
+                namespace=namespace,
+                filter=metadata_filter,
+            )
+            for metadata_filter, top_k in plan
+        ))
+    result_lists = [search.get("matches", []) for search in searches]
+    if lexical_matches:
+        result_lists.append(lexical_matches)
+    fused = result_lists[0] if len(result_lists) == 1 else reciprocal_rank_fusion(*result_lists, top_k=FUSED_TOP_K)
+    # Vector metadata is slim; fetch the bodies of the final hits in one batch
+    with span("chat.hydrate"):
+        return await run_blocking(hydrate, fused)
+
+
+def compose_messages(req: ChatRequest, history, context: str, today: datetime, usage: dict):
+    """
+    System prompt with course context, the last few turns that fit the history
+    budget, then the question. Returns (messages, usage) with token counts added.
+    """
+    recent_messages, history_tokens = trim_history(history)
+    today_str = today.strftime("%B %d, %Y")
+    system_prompt = f"""You are an advanced Canvas academic assistant with access to course materials.
 TODAY'S DATE: {today_str}
 Answer only using the provided context and course data.
 COURSE CONTEXT:
 {context}
 """
 
-        messages = [{"role": "system", "content": system_prompt}] + recent_messages + [
-            {"role": "user", "content": req.message}
+    messages = [{"role": "system", "content": system_prompt}] + recent_messages + [
+        {"role": "user", "content": req.message}
+    ]
+    usage = {
+        **usage,
+        "context_tokens": count_tokens(context),
+        "history_tokens": history_tokens,
+        "prompt_tokens": count_message_tokens(messages),
+    }
+    return messages, usage
+
+
+def build_chat_messages(req: ChatRequest, history, matches):
+    """
+    Build the OpenAI message list from retrieved course context: overlapping
+    chunks are merged and the highest-scoring passages are packed into the
+    context token budget. Returns (messages, usage), or (None, None) if nothing matched.
+    """
+    if not matches:
+        return None, None
+
+    matches, merged = merge_overlapping(matches)
+    packed, dropped, _ = pack(matches, CONTEXT_TOKEN_BUDGET, text=lambda m: m["metadata"]["text"])
+
+    assignments, announcements, other_context = [], [], []
+    today = datetime.now()
+
+    for m in packed:
+        text = m["metadata"]["text"]
+        score = m.get("score", 0)
+        due_date = match_date(m["metadata"])
+
+        # Legacy vectors predate the "type" field
+        kind = m["metadata"].get("type")
+        is_assignment = kind == "assignment" if kind else text.startswith("Assignment:")
+        is_announcement = kind == "announcement" if kind else text.startswith("Announcement:")
+
+        if is_assignment and due_date and due_date >= today:
+            assignments.append({'date': due_date, 'text': text, 'score': score})
+        elif is_announcement:
+            announcements.append({'text': text, 'score': score, 'date': due_date})
+        else:
+            other_context.append({'text': text, 'score': score})
+
+    assignments.sort(key=lambda x: x['date'])
+
+    context_parts = []
+    if assignments:
+        context_parts.append("=== UPCOMING ASSIGNMENTS ===")
+        for i, a in enumerate(assignments, 1):
+            date_str = a['date'].strftime("%B %d, %Y")
+            context_parts.append(f"[Assignment {i}] Due: {date_str}\n{a['text']}")
+    if announcements:
+        announcements.sort(key=lambda x: x['score'], reverse=True)
+        context_parts.append("\n\n=== RECENT ANNOUNCEMENTS ===")
+        for ann in announcements:
+            context_parts.append(ann['text'])
+    if other_context:
+        other_context.sort(key=lambda x: x['score'], reverse=True)
+        context_parts.append("\n\n=== ADDITIONAL COURSE INFORMATION ===")
+        for ctx in other_context:
+            context_parts.append(ctx['text'])
+    context = "\n\n".join(context_parts) or "No relevant course data found."
+    usage = {"chunks": len(packed), "chunks_dropped": dropped, "chunks_merged": merged}
+    return compose_messages(req, history, context, today, usage)
+
+
+def build_deadline_messages(req: ChatRequest, history, date_range):
+    """Build (messages, usage) for a date-range question straight from the deadline index"""
+    kind, start, end, label = date_range
+    today = datetime.now()
+    rows = events_between(req.course_id, kind, start, end)
+    if kind == "assignment":
+        heading = f"=== ASSIGNMENTS DUE {label.upper()} ==="
+        lines = [
+            f"[Assignment {i}] Due: {r['date'].strftime('%B %d, %Y %I:%M %p')}\n{r['text']}"
+            for i, r in enumerate(rows, 1)
         ]
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            max_tokens=700,
-            temperature=0.2,
+        empty = f"No assignments are due {label}."
+    else:
+        heading = f"=== ANNOUNCEMENTS POSTED {label.upper()} ==="
+        lines = [
+            f"[Announcement {i}] Posted: {r['date'].strftime('%B %d, %Y')}\n{r['text']}"
+            for i, r in enumerate(reversed(rows), 1)
+        ]
+        empty = f"No announcements were posted {label}."
+    # Rows are already in the order we want to show them: keep the earliest, stopping at the first that doesn't fit
+    lines, dropped, _ = pack(lines, CONTEXT_TOKEN_BUDGET, in_order=True)
+    if dropped:
+        lines.append(f"({dropped} more not shown)")
+    context = "\n\n".join([heading] + lines) if rows else empty
+    usage = {"chunks": len(rows) - dropped, "chunks_dropped": dropped, "chunks_merged": 0}
+    return compose_messages(req, history, context, today, usage)
+
+
+async def remember_turn(req: ChatRequest, answer: str):
+    """Append the finished question/answer pair to the session history"""
+    with span("chat.save_history"):
+        dropped = await append_chat_history(req.course_id, req.session_id, [
+            {"role": "user", "content": req.message},
+            {"role": "assistant", "content": answer},
+        ])
+    if dropped:
+        # Summarizing costs a model call; don't make the user wait for it
+        task = asyncio.create_task(summarize_history(req.course_id, req.session_id, dropped))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+
+def sse_event(data: dict, event: str = None) -> str:
+    """Format a Server-Sent Events frame"""
+    frame = f"data: {json.dumps(data)}\n\n"
+    return f"event: {event}\n{frame}" if event else frame
+
+
+async def prepare_chat(req: ChatRequest):
+    """
+    Shared front half of /chat and /chat/stream.
+    Returns (history, cached_answer, messages, usage, cache_entry): either a
+    cached answer, or the messages to send (None if nothing matched), their
+    prompt-token usage and the (query embedding, bucket key) under which to
+    cache the answer (None if it must not be cached).
+    """
+    with span("chat.history"):
+        history = await get_chat_history(req.course_id, req.session_id)
+
+    with span("chat.date_range"):
+        date_range = parse_date_range(req.message)
+        use_deadlines = date_range is not None and is_indexed(req.course_id)
+    if use_deadlines:
+        # "What's due this week?": a range lookup replaces retrieval and date parsing
+        inc("chat_requests", path="deadlines")
+        with span("chat.build_context"):
+            return history, None, *build_deadline_messages(req, history, date_range), None
+
+    with span("chat.lexical"):
+        lexical_matches, confident = await run_blocking(
+            lexical_search, req.course_id, req.message, top_k=LEXICAL_TOP_K
         )
+    if confident:
+        # Exact-term lookup (assignment name, section code, email): skip the embedding call
+        inc("chat_requests", path="lexical")
+        with span("chat.hydrate"):
+            lexical_matches = await run_blocking(hydrate, lexical_matches)
+        with span("chat.build_context"):
+            return history, None, *build_chat_messages(req, history, lexical_matches), None
+
+    with span("chat.embed"):
+        emb = await embed_query(req.message)
+
+    # Only first-turn questions are independent of the conversation so far
+    cache_entry = None
+    if not history:
+        cached, cache_key = answer_cache.lookup(req.course_id, emb)
+        if cached is not None:
+            inc("chat_requests", path="answer_cache")
+            return history, cached, None, None, None
+        cache_entry = (emb, cache_key)
+
+    inc("chat_requests", path="retrieval")
+    matches = await retrieve_matches(req, emb, lexical_matches)
+    with span("chat.build_context"):
+        return history, None, *build_chat_messages(req, history, matches), cache_entry
+
+
+def record_completion(usage: dict, answer: str):
+    """Token counters for one answered prompt"""
+    inc("chat_prompt_tokens", usage["prompt_tokens"])
+    inc("chat_completion_tokens", count_tokens(answer))
+
+
+@router.post("/chat")
+async def chat_with_canvas(req: ChatRequest):
+    """Main chat endpoint: retrieves context, queries the vector store, and responds via OpenAI"""
+    try:
+        history, cached, messages, usage, cache_entry = await prepare_chat(req)
+        if cached is not None:
+            await remember_turn(req, cached)
+            return {"answer": cached}
+        if messages is None:
+            return {"answer": NO_DATA_ANSWER}
+
+        with span("chat.completion"):
+            response = await clients.openai.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                max_tokens=700,
+                temperature=0.2,
+            )
 
         answer = response.choices[0].message.content.strip()
+        record_completion(usage, answer)
+        await remember_turn(req, answer)
+        if cache_entry is not None:
+            answer_cache.store(req.course_id, cache_entry[0], answer, cache_entry[1])
+
+        return {"answer": answer, "usage": usage}
 
-        history.append({"role": "user", "content": req.message})
-        history.append({"role": "assistant", "content": answer})
-        save_chat_history(req.course_id, req.session_id, history)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return {"answer": answer}
 
+@router.post("/chat/stream")
+async def chat_with_canvas_stream(req: ChatRequest):
+    """
+    Streaming variant of /chat: forwards answer tokens as Server-Sent Events.
+    Emits `data: {"token": ...}` frames, then `event: done` with the full answer
+    and prompt usage (or `event: error`). History is saved only once the stream completes.
+    """
+    try:
+        history, cached, messages, usage, cache_entry = await prepare_chat(req)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def event_stream():
+        if cached is not None:
+            await remember_turn(req, cached)
+            yield sse_event({"token": cached})
+            yield sse_event({"answer": cached}, event="done")
+            return
+
+        if messages is None:
+            yield sse_event({"token": NO_DATA_ANSWER})
+            yield sse_event({"answer": NO_DATA_ANSWER}, event="done")
+            return
+
+        try:
+            # Headers are already sent, so these only reach the histograms
+            start = time.perf_counter()
+            stream = await clients.openai.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                max_tokens=700,
+                temperature=0.2,
+                stream=True,
+            )
+            parts = []
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    if not parts:
+                        observe("stage_seconds", time.perf_counter() - start, stage="chat.first_token")
+                    parts.append(token)
+                    yield sse_event({"token": token})
+            observe("stage_seconds", time.perf_counter() - start, stage="chat.completion")
+
+            answer = "".join(parts).strip()
+            record_completion(usage, answer)
+            await remember_turn(req, answer)
+            if cache_entry is not None:
+                answer_cache.store(req.course_id, cache_entry[0], answer, cache_entry[1])
+            yield sse_event({"answer": answer, "usage": usage}, event="done")
+        except Exception as e:
+            yield sse_event({"detail": str(e)}, event="error")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Stop proxies (nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/chat/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the query-embedding and answer caches, plus query batching"""
+    return {
+        "embeddings": embedding_cache.stats(),
+        "query_batches": query_embedder.stats(),
+        "answers": answer_cache.stats(),
+    }
+
+
+@router.get("/chat/memory/stats")
+async def memory_stats():
+    """Per-operation latency histograms of the session memory backend"""
+    return memory_store.stats()
+
 
 @router.delete("/chat/reset")
 async def reset_memory(course_id: int, session_id: str):
     """Reset conversation memory for a specific course and session"""
-    key = get_memory_key(course_id, session_id)
-    redis_client.delete(key)
+    await memory_store.delete(get_memory_key(course_id, session_id), get_summary_key(course_id, session_id))
     return {"status": "memory cleared"}
@@ -1,253 +1,677 @@
 from fastapi import APIRouter, HTTPException
-import os, httpx, traceback, re
-from openai import OpenAI
-from pinecone import Pinecone
+from pydantic import BaseModel
+import os, httpx, traceback, re, asyncio
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
+from app.clients import clients
+from app.utils.answer_cache import answer_cache
+from app.canvas_api import canvas, auth_headers, get_courses
+from app.utils.manifest import (
+    vector_id, load_manifest, load_sync_state, save_manifest, delete_manifest, list_manifests, record_pending,
+    load_pending,
+)
+from app.utils.pipeline import merge, embed_and_upsert, StageStats, EMBED_BULK_BATCH_SIZE
+from app.jobs import JobQueue, Scheduler
+from app.utils.vector_store import EMBEDDING_PROFILE, EMBEDDING_REQUEST
+from app.utils import bm25, content_store
+from app.utils.deadlines import replace_course_events, delete_course_events, parse_canvas_time
+from app.utils.text import clean_html, chunk_text
+from app.utils.executor import run_cpu, run_blocking
+from app.utils.metrics import span, inc
 
 load_dotenv()
 
 router = APIRouter()
 BASE_URL = os.getenv("CANVAS_BASE_URL")
-ACCESS_TOKEN = os.getenv("CANVAS_ACCESS_TOKEN")
-
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX = os.getenv("PINECONE_INDEX")
-
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX)
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-
-def clean_html(html_text: str) -> str:
-    """Remove HTML tags and extra whitespace"""
-    if not html_text:
-        return ""
-    soup = BeautifulSoup(html_text, "html.parser")
-    text = soup.get_text(separator=" ", strip=True)
-    return re.sub(r"\s+", " ", text).strip()
-
-
-def chunk_text(text: str, max_chars: int = 2000, overlap: int = 200):
-    """Split large text into overlapping chunks"""
-    if not text:
-        return [""]
-    text = re.sub(r"\s+", " ", text).strip()
-    if len(text) <= max_chars:
-        return [text]
-
-    chunks, start = [], 0
-    while start < len(text):
-        end = min(start + max_chars, len(text))
-        if end < len(text):
-            last_period = text.rfind(".", start, end)
-            if last_period > start + max_chars // 2:
-                end = last_period + 1
-        chunks.append(text[start:end])
-        start = end - overlap if end < len(text) else len(text)
-    return chunks
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# Pages with less HTML than this are cleaned inline; shipping them to a worker process costs more
+CPU_OFFLOAD_MIN_CHARS = int(os.getenv("CPU_OFFLOAD_MIN_CHARS", "50000"))
+# Background delta sync of every ingested course every SYNC_INTERVAL seconds (0 = off).
+# Every SYNC_FULL_EVERY-th run lists everything, which also catches deleted
+# announcements and discussions that a delta listing can't see.
+SYNC_INTERVAL = float(os.getenv("SYNC_INTERVAL", "0"))
+SYNC_FULL_EVERY = int(os.getenv("SYNC_FULL_EVERY", "24"))
+# Only one process (e.g. of several uvicorn workers) runs the schedule: whichever holds this lock file
+SYNC_LOCK_FILE = os.getenv("SYNC_LOCK_FILE", os.path.join(os.getenv("DATA_DIR", "data"), "sync-scheduler.lock"))
+# Start of the announcement listing on full syncs (Canvas defaults to the last 14 days)
+ANNOUNCEMENTS_SINCE = "2000-01-01"
+
+def parse_link_header(link_header: str) -> dict:
+    """Map rel names to URLs from a Canvas `Link` pagination header"""
+    links = {}
+    for link in link_header.split(","):
+        if "rel=" not in link:
+            continue
+        rel = link[link.find('rel="') + 5:].split('"')[0]
+        links[rel] = link[link.find("<") + 1:link.find(">")]
+    return links
+
+
+def page_list(response: httpx.Response) -> list:
+    """Items of a follow-up page; errors and malformed pages raise"""
+    response.raise_for_status()
+    items = response.json()
+    if not isinstance(items, list):
+        raise ValueError(f"Unexpected Canvas page from {response.url}: {str(items)[:200]}")
+    return items
+
+
+async def iter_paginated(http, url, headers, params, ordered: bool = False):
+    """
+    Yield each page of a paginated Canvas API endpoint as soon as it arrives.
+    When Canvas advertises the last page, the remaining pages are fetched
+    concurrently; otherwise (or with ordered=True, so a caller can stop early)
+    the `next` links are walked in order.
+    Any failed page raises: a partial listing must never pass for a complete
+    one, or the sync would delete everything on the missing pages.
+    """
+    response = await http.get(url, headers=headers, params=params)
+    response.raise_for_status()
+    items = response.json()
+    if not isinstance(items, list):
+        yield [items]
+        return
+    yield items
+    links = parse_link_header(response.headers.get("Link", ""))
+
+    last_page = httpx.URL(links["last"]).params.get("page", "") if "last" in links else ""
+    if "next" in links and last_page.isdigit() and items and not ordered:
+        page_count = int(last_page)
+        next_url = httpx.URL(links["next"])
+        pending = [
+            http.get(str(next_url.copy_set_param("page", str(page))), headers=headers)
+            for page in range(2, page_count + 1)
+        ]
+        for next_response in asyncio.as_completed(pending):
+            yield page_list(await next_response)
+        return
+
+    current_url = links.get("next")
+    while current_url:
+        response = await http.get(current_url, headers=headers)
+        yield page_list(response)
+        current_url = parse_link_header(response.headers.get("Link", "")).get("next")
 
 
 async def fetch_all_paginated(http, url, headers, params):
     """Fetch all pages of a paginated Canvas API endpoint"""
     all_items = []
-    current_url = url
-    while current_url:
-        response = await http.get(current_url, headers=headers, params=params if current_url == url else None)
-        items = response.json()
-        if isinstance(items, list):
-            all_items.extend(items)
-        else:
-            all_items.append(items)
-            break
-        link_header = response.headers.get("Link", "")
-        next_link = None
-        for link in link_header.split(","):
-            if 'rel="next"' in link:
-                next_link = link[link.find("<") + 1:link.find(">")]
-                break
-        current_url = next_link
-        if len(all_items) > 500:
-            break
+    async for page in iter_paginated(http, url, headers, params):
+        all_items.extend(page)
     return all_items
 
 
-@router.post("/ingest/{course_id}")
-async def ingest_course(course_id: int):
-    """Fetch Canvas data, embed it, and upload to Pinecone"""
-    try:
-        headers = {"Authorization": f"Bearer {ACCESS_TOKEN}"}
-        async with httpx.AsyncClient(timeout=30.0) as http:
-            course_res = await http.get(
-                f"{BASE_URL}/api/v1/courses/{course_id}",
-                headers=headers,
-                params={"include[]": "syllabus_body"},
-            )
-            course = course_res.json()
-            course_name = course.get("name", "Unknown Course")
-            syllabus = course.get("syllabus_body", "")
-
-            assignments = await fetch_all_paginated(
-                http,
-                f"{BASE_URL}/api/v1/courses/{course_id}/assignments",
-                headers,
-                {"per_page": 100}
-            )
-            announcements = await fetch_all_paginated(
-                http,
-                f"{BASE_URL}/api/v1/announcements",
-                headers,
-                {"context_codes[]": f"course_{course_id}", "per_page": 100}
-            )
-            discussions = await fetch_all_paginated(
-                http,
-                f"{BASE_URL}/api/v1/courses/{course_id}/discussion_topics",
-                headers,
-                {"per_page": 100}
-            )
-            people = await fetch_all_paginated(
-                http,
-                f"{BASE_URL}/api/v1/courses/{course_id}/users",
-                headers,
-                {"enrollment_type[]": ["teacher", "ta"], "per_page": 100}
-            )
-
-        embeddings, vector_id = [], 0
-
-        # Syllabus
-        if syllabus:
-            clean_syllabus = clean_html(syllabus)
-            chunks = chunk_text(clean_syllabus, max_chars=2000)
-            for chunk in chunks:
-                if chunk.strip():
-                    embeddings.append({
-                        "text": f"Syllabus for {course_name}: {chunk}",
-                        "type": "syllabus",
-                        "id": f"{course_id}-{vector_id}"
-                    })
-                    vector_id += 1
-
-        # Assignments
-        for a in assignments:
-            name = a.get("name", "Untitled")
-            due_at = a.get("due_at") or ""
-            points = a.get("points_possible") or 0
-            desc = clean_html(a.get("description", ""))
-            chunks = chunk_text(desc, max_chars=2000) if desc else [""]
-            for i, chunk in enumerate(chunks):
-                text = f"Assignment: {name} | Due: {due_at} | Points: {points} | Description: {chunk}"
-                metadata = {
-                    "text": text,
-                    "type": "assignment",
-                    "name": name,
-                    "chunk_index": i,
-                    "id": f"{course_id}-{vector_id}"
-                }
-                if due_at:
-                    metadata["due_date"] = due_at
-                if points > 0:
-                    metadata["points"] = float(points)
-                embeddings.append(metadata)
-                vector_id += 1
-
-        # Announcements
-        for ann in announcements:
-            title = ann.get("title", "Untitled")
-            posted_at = ann.get("posted_at") or ""
-            message = clean_html(ann.get("message", ""))
-            section_match = re.findall(r'\b\d{5}\b', title + " " + message)
-            sections = list(set(section_match)) if section_match else []
-            chunks = chunk_text(message, max_chars=2000) if message else [""]
-            for i, chunk in enumerate(chunks):
-                text = f"Announcement: {title} | Date: {posted_at} | {chunk}"
-                metadata = {
-                    "text": text,
-                    "type": "announcement",
-                    "title": title,
-                    "chunk_index": i,
-                    "id": f"{course_id}-{vector_id}"
-                }
-                if posted_at:
-                    metadata["posted_date"] = posted_at
-                if sections:
-                    metadata["sections"] = ",".join(sections)
-                embeddings.append(metadata)
-                vector_id += 1
-
-        # Discussions
-        for d in discussions:
-            title = d.get("title", "Untitled")
-            message = clean_html(d.get("message", ""))
-            chunks = chunk_text(message, max_chars=2000) if message else [""]
-            for i, chunk in enumerate(chunks):
-                text = f"Discussion: {title} | Content: {chunk}"
-                embeddings.append({
-                    "text": text,
-                    "type": "discussion",
-                    "title": title,
-                    "chunk_index": i,
-                    "id": f"{course_id}-{vector_id}"
-                })
-                vector_id += 1
-
-        # People
-        for p in people:
-            name = p.get("name", "Unknown")
-            enrollments = p.get("enrollments", [])
-            role = enrollments[0].get("type", "Staff") if enrollments else "Staff"
-            email = f"{p.get('login_id', 'unknown')}@asu.edu"
-            text = f"{role}: {name} | Email: {email}"
-            embeddings.append({
-                "text": text,
-                "type": "person",
-                "name": name,
-                "role": role,
-                "email": email,
-                "id": f"{course_id}-{vector_id}"
+def syllabus_items(course_name: str, syllabus: str):
+    items = []
+    for chunk in chunk_text(clean_html(syllabus)):
+        if chunk.strip():
+            items.append({
+                "text": f"Syllabus for {course_name}: {chunk}",
+                "type": "syllabus"
             })
-            vector_id += 1
-
-        if not embeddings:
-            raise HTTPException(status_code=400, detail="No course data found.")
-
-        # Create embeddings and upload to Pinecone
-        vectors = []
-        batch_size = 50
-        for i in range(0, len(embeddings), batch_size):
-            batch = embeddings[i:i + batch_size]
-            texts = [item["text"] for item in batch]
-            response = client.embeddings.create(
-                model="text-embedding-3-large",
-                input=texts
-            )
-            for j, emb_data in enumerate(response.data):
-                item = batch[j]
-                vectors.append({
-                    "id": item["id"],
-                    "values": emb_data.embedding,
-                    "metadata": {k: v for k, v in item.items() if k != "id"}
-                })
+    return items
+
+
+def assignment_items(a: dict):
+    items = []
+    name = a.get("name", "Untitled")
+    due_at = a.get("due_at") or ""
+    points = a.get("points_possible") or 0
+    due_ts = parse_canvas_time(due_at)
+    desc = clean_html(a.get("description", ""))
+    chunks = chunk_text(desc) if desc else [""]
+    for i, chunk in enumerate(chunks):
+        text = f"Assignment: {name} | Due: {due_at} | Points: {points} | Description: {chunk}"
+        metadata = {
+            "text": text,
+            "type": "assignment",
+            "name": name,
+            "chunk_index": i,
+        }
+        if due_at:
+            metadata["due_date"] = due_at
+        if due_ts is not None:
+            # Numeric copy so queries can range-filter on it
+            metadata["due_ts"] = due_ts
+        if points > 0:
+            metadata["points"] = float(points)
+        items.append(metadata)
+    return items
+
+
+def announcement_items(ann: dict):
+    items = []
+    title = ann.get("title", "Untitled")
+    posted_at = ann.get("posted_at") or ""
+    posted_ts = parse_canvas_time(posted_at)
+    message = clean_html(ann.get("message", ""))
+    section_match = re.findall(r'\b\d{5}\b', title + " " + message)
+    sections = list(set(section_match)) if section_match else []
+    chunks = chunk_text(message) if message else [""]
+    for i, chunk in enumerate(chunks):
+        text = f"Announcement: {title} | Date: {posted_at} | {chunk}"
+        metadata = {
+            "text": text,
+            "type": "announcement",
+            "title": title,
+            "chunk_index": i,
+        }
+        if posted_at:
+            metadata["posted_date"] = posted_at
+        if posted_ts is not None:
+            metadata["posted_ts"] = posted_ts
+        if sections:
+            metadata["sections"] = ",".join(sections)
+        items.append(metadata)
+    return items
+
+
+def discussion_items(d: dict):
+    items = []
+    title = d.get("title", "Untitled")
+    message = clean_html(d.get("message", ""))
+    chunks = chunk_text(message) if message else [""]
+    for i, chunk in enumerate(chunks):
+        text = f"Discussion: {title} | Content: {chunk}"
+        items.append({
+            "text": text,
+            "type": "discussion",
+            "title": title,
+            "chunk_index": i
+        })
+    return items
+
+
+def build_items(build, raws: list[dict]):
+    """Apply an item builder to a page of Canvas objects (module-level so it can run in a worker process)"""
+    return [item for raw in raws for item in build(raw)]
+
+
+def html_size(raw: dict) -> int:
+    return len(raw.get("description") or raw.get("message") or "")
+
+
+def person_items(p: dict):
+    name = p.get("name", "Unknown")
+    enrollments = p.get("enrollments", [])
+    role = enrollments[0].get("type", "Staff") if enrollments else "Staff"
+    email = f"{p.get('login_id', 'unknown')}@asu.edu"
+    text = f"{role}: {name} | Email: {email}"
+    return [{
+        "text": text,
+        "type": "person",
+        "name": name,
+        "role": role,
+        "email": email
+    }]
+
+
+def build_sources(name: str, build, raws: list[dict]):
+    """Like build_items, but keeps each Canvas object's chunks together under its source key"""
+    return [(f"{name}:{raw.get('id')}", build(raw)) for raw in raws]
+
+
+def assignment_stamp(a: dict):
+    return a.get("updated_at")
+
+
+def announcement_stamp(ann: dict):
+    return ann.get("posted_at")
+
+
+def discussion_stamp(d: dict):
+    return d.get("last_reply_at") or d.get("posted_at")
+
+
+def newer(a: str, b: str) -> str:
+    """The later of two Canvas timestamps (either may be missing)"""
+    if not a or not b:
+        return a or b
+    return a if (parse_canvas_time(a) or 0) >= (parse_canvas_time(b) or 0) else b
+
+
+async def iter_course_items(course_id: int, source: dict, complete: set = None, high_water: dict = None,
+                            known: set = None):
+    """
+    Stream a course's chunks while its Canvas resources are still being fetched,
+    as (source key, chunk dicts) per Canvas object; the chunks are None when
+    the object is unchanged since the last sync. Per-resource object counts and
+    the course name are recorded in `source`, and the names of resources that
+    were listed in full (so missing objects were deleted) are added to `complete`.
+
+    `high_water` (newest updated_at/posted_at per resource) is updated in place.
+    With `known` (source keys indexed by the last sync) this is a delta sync
+    against the marks already in `high_water`: known objects at or below the
+    mark are not rebuilt, announcements are requested from the mark on, and
+    discussions are read most-recent-first until a whole page is older than
+    the mark.
+    """
+    headers = auth_headers()
+    delta = known is not None
+    high_water = {} if high_water is None else high_water
+    complete = set() if complete is None else complete
+    complete.update(("syllabus", "people"))
+
+    async def syllabus():
+        course_res = await canvas.get(
+            f"{BASE_URL}/api/v1/courses/{course_id}",
+            headers=headers,
+            params={"include[]": "syllabus_body"},
+        )
+        course_res.raise_for_status()
+        course = course_res.json()
+        source["course"] = course.get("name", "Unknown Course")
+        body = course.get("syllabus_body")
+        if body:
+            if len(body) >= CPU_OFFLOAD_MIN_CHARS:
+                items = await run_cpu(syllabus_items, source["course"], body)
+            else:
+                items = syllabus_items(source["course"], body)
+            yield "syllabus", items
+
+    async def resource(name, url, params, build, stamp=None, partial=False, stop_early=False):
+        source[name] = 0
+        mark = high_water.get(name) if delta and stamp else None
+        mark_ts = parse_canvas_time(mark)
+        pages = iter_paginated(canvas, url, headers, params, ordered=stop_early and mark_ts is not None)
+        stopped = False
+        try:
+            async for page in pages:
+                source[name] += len(page)
+                changed = []
+                for raw in page:
+                    ts = stamp(raw) if stamp else None
+                    if ts:
+                        high_water[name] = newer(high_water.get(name), ts)
+                    key = f"{name}:{raw.get('id')}"
+                    stamped = parse_canvas_time(ts)
+                    if mark_ts is not None and stamped is not None and stamped <= mark_ts and key in known:
+                        yield key, None
+                    else:
+                        changed.append(raw)
+                # HTML cleaning and chunking are CPU-bound; big pages go to the process pool
+                if sum(html_size(raw) for raw in changed) >= CPU_OFFLOAD_MIN_CHARS:
+                    built = await run_cpu(build_sources, name, build, changed)
+                else:
+                    built = build_sources(name, build, changed)
+                for key, items in built:
+                    yield key, items
+                if stop_early and mark_ts is not None and not changed:
+                    # Most recent first: once a whole page is old, the rest is too
+                    stopped = True
+                    break
+        finally:
+            await pages.aclose()
+        if not stopped and not (partial and mark_ts is not None):
+            complete.add(name)
+
+    # Both ends are explicit: end_date otherwise defaults to 28 days after start_date
+    announcement_params = {
+        "context_codes[]": f"course_{course_id}",
+        "per_page": 100,
+        "start_date": ANNOUNCEMENTS_SINCE,
+        "end_date": (datetime.now(timezone.utc) + timedelta(days=365)).strftime("%Y-%m-%d"),
+    }
+    if delta and high_water.get("announcements"):
+        announcement_params["start_date"] = high_water["announcements"]
+    discussion_params = {"per_page": 100}
+    if delta:
+        discussion_params["order_by"] = "recent_activity"
+
+    async for key_items in merge(
+        syllabus(),
+        resource(
+            "assignments",
+            f"{BASE_URL}/api/v1/courses/{course_id}/assignments",
+            {"per_page": 100},
+            assignment_items,
+            stamp=assignment_stamp,
+        ),
+        resource(
+            "announcements",
+            f"{BASE_URL}/api/v1/announcements",
+            announcement_params,
+            announcement_items,
+            stamp=announcement_stamp,
+            partial=True,
+        ),
+        resource(
+            "discussions",
+            f"{BASE_URL}/api/v1/courses/{course_id}/discussion_topics",
+            discussion_params,
+            discussion_items,
+            stamp=discussion_stamp,
+            stop_early=True,
+        ),
+        resource(
+            "people",
+            f"{BASE_URL}/api/v1/courses/{course_id}/users",
+            {"enrollment_type[]": ["teacher", "ta"], "per_page": 100},
+            person_items,
+        ),
+    ):
+        yield key_items
+
+
+async def embed_texts(texts: list[str]) -> list[list[float]]:
+    response = await clients.openai.embeddings.create(
+        input=texts,
+        **EMBEDDING_REQUEST
+    )
+    return [emb_data.embedding for emb_data in response.data]
+
+
+def previous_items(previous_ids: set):
+    """Chunk dicts of the last ingest (the content store keeps them), or None if any are missing"""
+    chunks = content_store.get_chunks(previous_ids, require_metadata=True)
+    if len(chunks) < len(previous_ids):
+        return None
+    return chunks
 
+
+async def sync_courses(course_ids: list[int], full: bool = False, progress: dict = None, bulk: bool = False,
+                       delta: bool = False):
+    """
+    Fetch, embed and upsert courses through one streaming pipeline.
+
+    Chunks from every course share embedding requests (with bulk=True they are
+    packed up to the API's item/token limits) and are fanned back out to each
+    course_{id} namespace on upsert. Per course, only chunks missing from its
+    manifest are embedded and vectors whose source disappeared are deleted.
+    Ids are logged as pending before each upsert, so whatever a failed sync
+    wrote is cleaned up (or confirmed) by the next one. A course that needs a
+    reset is fetched in full before its namespace is wiped.
+    With delta=True, Canvas objects unchanged since the last sync's high-water
+    marks are neither fetched in full nor rebuilt (see iter_course_items); their
+    chunks are carried over. A course without the state from a previous sync
+    falls back to a normal sync.
+    `progress` is updated in place with the current stage, fetched item counts
+    per course and the pipeline stage stats. Returns {course_id: result}.
+    """
+    if full and delta:
+        raise ValueError("full and delta syncs are mutually exclusive")
+    progress = {} if progress is None else progress
+    progress["stage"] = "starting"
+
+    courses = {}
+    for course_id in course_ids:
         namespace = f"course_{course_id}"
-        batch_size = 100
-        for i in range(0, len(vectors), batch_size):
-            batch = vectors[i:i + batch_size]
-            index.upsert(vectors=batch, namespace=namespace)
+        previous_ids = None if full else load_manifest(course_id, EMBEDDING_PROFILE)
+        # No usable manifest (first ingest, legacy positional ids, a changed embedding
+        # profile, or forced full re-ingest): the namespace is rebuilt from empty
+        reset = previous_ids is None
+        if reset:
+            previous_ids = set()
+        state = load_sync_state(course_id)
+        carried = None
+        if delta and not reset and state["sources"]:
+            # An empty carry-over means there is nothing to build a delta on
+            carried = await run_blocking(previous_items, previous_ids) or None
+        courses[course_id] = {
+            "namespace": namespace,
+            "previous_ids": previous_ids,
+            # Possibly written by a sync that failed: deleted unless current, re-upserted if current
+            "pending": set() if reset else load_pending(course_id),
+            "reset": reset,
+            "current_ids": set(),
+            "items": {},
+            "embedded": 0,
+            "source": {"course": "Unknown Course"},
+            # Delta sync: carried holds the last sync's chunks for objects that didn't change
+            "delta": carried is not None,
+            "carried": carried or {},
+            "previous_sources": state["sources"],
+            "sources": {},
+            "complete": set(),
+            "high_water": dict(state["high_water"]) if carried is not None else {},
+            "unchanged": 0,
+        }
+
+    stage_stats = {"embed": StageStats(), "upsert": StageStats()}
+    progress.update(
+        stage="streaming",
+        fetched={course_id: c["source"] for course_id, c in courses.items()},
+        **stage_stats
+    )
+
+    def carry_over(course, key):
+        """Keep a Canvas object's chunks from the last sync without rebuilding them"""
+        course["sources"][key] = course["previous_sources"][key]
+        for vid in course["sources"][key]:
+            course["current_ids"].add(vid)
+            course["items"][vid] = course["carried"][vid]
+
+    async def reset_namespace(course_id):
+        course = courses[course_id]
+        await clients.vector_store.adelete(delete_all=True, namespace=course["namespace"])
+        await run_blocking(content_store.delete_namespace, course["namespace"])
+        # The old vectors are gone: if this sync fails, the next one must not count them as indexed
+        save_manifest(course_id, [], EMBEDDING_PROFILE, {}, {})
+
+    async def replay(entries):
+        for entry in entries:
+            yield entry
+
+    async def new_items(course_id):
+        course = courses[course_id]
+        entries = iter_course_items(
+            course_id,
+            course["source"],
+            course["complete"],
+            high_water=course["high_water"],
+            known=set(course["previous_sources"]) if course["delta"] else None,
+        )
+        if course["reset"]:
+            # Wipe only once Canvas has answered in full, so an error keeps the old index
+            entries = [entry async for entry in entries]
+            if any(items for _, items in entries):
+                await reset_namespace(course_id)
+            entries = replay(entries)
+        async for key, items in entries:
+            if items is None:
+                course["unchanged"] += 1
+                carry_over(course, key)
+                continue
+            vids = course["sources"].setdefault(key, [])
+            for item in items:
+                # Key every chunk by its content so unchanged chunks keep their vector id
+                vid = vector_id(course_id, item)
+                if vid not in vids:
+                    vids.append(vid)
+                if vid in course["current_ids"]:
+                    continue
+                course["current_ids"].add(vid)
+                course["items"][vid] = item
+                if vid not in course["previous_ids"]:
+                    course["embedded"] += 1
+                    yield {"id": vid, "namespace": course["namespace"], **item}
+
+    namespace_courses = {course["namespace"]: course_id for course_id, course in courses.items()}
+
+    async def upsert_vectors(namespace, vectors):
+        record_pending(namespace_courses[namespace], [v["id"] for v in vectors])
+        # Bodies go to the content store first so a queried vector always has its text
+        with span("ingest.content_store"):
+            await run_blocking(content_store.put_chunks, namespace, {v["id"]: dict(v["metadata"]) for v in vectors})
+        for v in vectors:
+            del v["metadata"]["text"]
+        await clients.vector_store.aupsert(vectors=vectors, namespace=namespace)
+
+    batch_size = {"embed_batch_size": EMBED_BULK_BATCH_SIZE} if bulk else {}
+    with span("ingest.pipeline"):
+        pipeline = await embed_and_upsert(
+            merge(*(new_items(course_id) for course_id in courses)),
+            embed_texts,
+            upsert_vectors,
+            stats=stage_stats,
+            **batch_size
+        )
 
-        return {
+    # Remove vectors whose source item changed or disappeared from Canvas
+    progress["stage"] = "deleting stale vectors"
+    results = {}
+    for course_id, course in courses.items():
+        if course["delta"]:
+            # Objects a partial listing didn't reach are assumed unchanged, not deleted
+            for key in course["previous_sources"]:
+                if key not in course["sources"] and key.split(":")[0] not in course["complete"]:
+                    carry_over(course, key)
+        current_ids, source = course["current_ids"], course["source"]
+        if not current_ids:
+            # Nothing came back from Canvas (a reset only wipes the namespace once
+            # something did); leave the existing index alone
+            results[course_id] = {"status": "empty", "course": source["course"]}
+            continue
+
+        stale_ids = [vid for vid in course["previous_ids"] | course["pending"] if vid not in current_ids]
+        batch_size = 1000
+        with span("ingest.delete_stale"):
+            for i in range(0, len(stale_ids), batch_size):
+                await clients.vector_store.adelete(ids=stale_ids[i:i + batch_size], namespace=course["namespace"])
+            await run_blocking(content_store.delete_chunks, stale_ids)
+
+        with span("ingest.local_indexes"):
+            save_manifest(course_id, current_ids, EMBEDDING_PROFILE, course["sources"], course["high_water"])
+            # The lexical index is cheap to rebuild, so it always covers every current chunk
+            await run_blocking(bm25.save_index, course_id, course["items"])
+            await run_blocking(replace_course_events, course_id, course["items"].values())
+            # Chunks stored before the content store kept their fields get them now
+            await run_blocking(content_store.backfill_metadata, course["namespace"], course["items"])
+        inc("ingest_chunks", len(current_ids) - course["embedded"], result="skipped")
+        inc("ingest_chunks", course["embedded"], result="embedded")
+        inc("ingest_chunks", len(stale_ids), result="deleted")
+
+        if course["embedded"] or stale_ids:
+            # Cached answers were generated from the previous course data
+            answer_cache.invalidate(course_id)
+
+        results[course_id] = {
             "status": "success",
-            "course": course_name,
+            "course": source["course"],
             "stats": {
-                "total_chunks": len(vectors),
-                "assignments": len(assignments),
-                "announcements": len(announcements),
-                "discussions": len(discussions),
-                "people": len(people)
+                "total_chunks": len(current_ids),
+                "embedded": course["embedded"],
+                "skipped": len(current_ids) - course["embedded"],
+                "deleted": len(stale_ids),
+                "delta": course["delta"],
+                "unchanged_objects": course["unchanged"],
+                "assignments": source.get("assignments", 0),
+                "announcements": source.get("announcements", 0),
+                "discussions": source.get("discussions", 0),
+                "people": source.get("people", 0)
             }
         }
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    progress["stage"] = "done"
+    progress["pipeline"] = pipeline
+    return results
+
+
+async def sync_course(course_id: int, full: bool = False, progress: dict = None, delta: bool = False):
+    """Fetch, embed and upsert one course (see sync_courses)"""
+    progress = {} if progress is None else progress
+    result = (await sync_courses([course_id], full=full, progress=progress, delta=delta))[course_id]
+    if result["status"] == "empty":
+        raise HTTPException(status_code=400, detail="No course data found.")
+    result["stats"]["pipeline"] = progress["pipeline"]
+    return result
+
+
+async def sync_courses_bulk(course_ids: list[int], full: bool = False, progress: dict = None):
+    """Ingest many courses with cross-course embedding batches (see sync_courses)"""
+    progress = {} if progress is None else progress
+    results = await sync_courses(course_ids, full=full, progress=progress, bulk=True)
+    return {"courses": results, "pipeline": progress["pipeline"]}
+
+
+class BulkIngestRequest(BaseModel):
+    course_ids: list[int] = []  # empty = all favorite courses
+    full: bool = False
+
+
+# Ingests run as background jobs: one active job per course, INGEST_WORKERS at a time
+ingest_jobs = JobQueue(run=sync_course, workers=INGEST_WORKERS)
+
+
+def submit_ingest(course_id: int, full: bool = False, delta: bool = False):
+    return ingest_jobs.submit(course_id, course_id=course_id, full=full, delta=delta)
+
+
+def submit_bulk_ingest(course_ids: list[int], full: bool = False):
+    course_ids = sorted(set(course_ids))
+    return ingest_jobs.submit(
+        f"bulk:{','.join(map(str, course_ids))}",
+        run=sync_courses_bulk,
+        locks=course_ids,
+        course_ids=course_ids,
+        full=full,
+    )
+
+
+async def scheduled_sync(tick: int):
+    """Queue a sync job per ingested course; courses with a job already active are skipped"""
+    delta = not SYNC_FULL_EVERY or (tick + 1) % SYNC_FULL_EVERY != 0
+    for course_id in list_manifests():
+        submit_ingest(course_id, delta=delta)
+
+
+sync_scheduler = Scheduler(scheduled_sync, SYNC_INTERVAL, lock_file=SYNC_LOCK_FILE)
+
+
+@router.post("/ingest/bulk", status_code=202)
+async def ingest_courses_bulk(req: BulkIngestRequest):
+    """
+    Queue one job that ingests many courses together, packing their chunks
+    into shared embedding requests. Defaults to all favorite courses.
+    """
+    course_ids = req.course_ids
+    if not course_ids:
+        try:
+            course_ids = [c["id"] for c in await get_courses()]
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=str(e))
+    return submit_bulk_ingest(course_ids, req.full).as_dict()
+
+
+@router.post("/ingest/favorites", status_code=202)
+async def ingest_favorite_courses(full: bool = False):
+    """Queue a bulk ingest job for every favorite (starred) course"""
+    return await ingest_courses_bulk(BulkIngestRequest(full=full))
+
+
+@router.get("/ingest/jobs")
+async def list_ingest_jobs():
+    """Recent and active ingest jobs"""
+    return {"jobs": [job.as_dict() for job in ingest_jobs.list()]}
+
+
+@router.get("/ingest/schedule")
+async def get_sync_schedule():
+    """State of the background delta sync"""
+    return {**sync_scheduler.as_dict(), "full_every": SYNC_FULL_EVERY, "courses": len(list_manifests())}
+
+
+@router.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    """Status, per-stage progress and throughput for one ingest job"""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.as_dict()
+
+
+@router.post("/ingest/{course_id}", status_code=202)
+async def ingest_course(course_id: int, full: bool = False, delta: bool = False):
+    """
+    Queue a job that fetches Canvas data, embeds it, and uploads it to the vector store.
+    Only new or changed chunks are embedded; pass ?full=true to rebuild
+    the namespace from scratch, or ?delta=true to only pull Canvas objects
+    changed since the last sync. Poll GET /ingest/jobs/{job_id} for progress.
+    Re-posting while a job for the course is active returns that job.
+    """
+    if full and delta:
+        raise HTTPException(status_code=400, detail="full and delta cannot be combined")
+    return submit_ingest(course_id, full, delta).as_dict()
 
 
 @router.delete("/ingest/{course_id}")
@@ -255,7 +679,14 @@ async def clear_course_data(course_id: int):
     """Delete all stored vectors for a specific course"""
     try:
         namespace = f"course_{course_id}"
-        index.delete(delete_all=True, namespace=namespace)
+        # Wait for any running ingest of this course so it can't re-populate the namespace
+        async with ingest_jobs.lock(course_id):
+            await clients.vector_store.adelete(delete_all=True, namespace=namespace)
+            await run_blocking(content_store.delete_namespace, namespace)
+            delete_manifest(course_id)
+            await run_blocking(bm25.delete_index, course_id)
+            await run_blocking(delete_course_events, course_id)
+            answer_cache.invalidate(course_id)
         return {"status": "success", "message": f"Cleared namespace {namespace}"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,102 @@
+import os
+import time
+import threading
+from datetime import date
+import numpy as np
+from dotenv import load_dotenv
+from app.utils.manifest import index_version
+
+load_dotenv()
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_PER_COURSE = int(os.getenv("ANSWER_CACHE_MAX_PER_COURSE", "256"))
+
+
+class AnswerCache:
+    """
+    Semantic cache of first-turn answers per course namespace.
+
+    A bucket is only valid for one (ingestion version, calendar day) pair: the
+    version fingerprints the course's manifest on disk, so a re-ingest that
+    changes the index invalidates answers in every worker, and the prompt embeds
+    TODAY'S DATE, so answers never outlive either. Within a bucket, a question hits when its
+    embedding's cosine similarity to a cached question reaches the threshold.
+    """
+
+    def __init__(self, threshold: float, ttl: int, max_per_course: int):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_per_course = max_per_course
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _bucket_key(course_id: int):
+        return (index_version(course_id), date.today().isoformat())
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def lookup(self, course_id: int, embedding):
+        """
+        Return (cached answer or None, bucket key). Pass the key to `store` so an
+        answer built from retrieval before a re-ingest or midnight isn't kept.
+        """
+        namespace = f"course_{course_id}"
+        with self._lock:
+            key = self._bucket_key(course_id)
+            bucket = self._buckets.get(namespace)
+            if bucket is None or bucket["key"] != key or not bucket["answers"]:
+                self.misses += 1
+                return None, key
+
+            scores = bucket["vectors"] @ self._unit(embedding)
+            best = int(np.argmax(scores))
+            fresh = time.monotonic() - bucket["created"][best] <= self.ttl
+            if scores[best] >= self.threshold and fresh:
+                self.hits += 1
+                return bucket["answers"][best], key
+            self.misses += 1
+            return None, key
+
+    def store(self, course_id: int, embedding, answer: str, key):
+        """Cache an answer under the bucket key its `lookup` returned; dropped if that bucket is gone"""
+        namespace = f"course_{course_id}"
+        vector = self._unit(embedding)[np.newaxis, :]
+        with self._lock:
+            if key != self._bucket_key(course_id):
+                return
+            bucket = self._buckets.get(namespace)
+            if bucket is None or bucket["key"] != key or bucket["vectors"].shape[1] != vector.shape[1]:
+                bucket = {"key": key, "vectors": vector[:0], "answers": [], "created": []}
+                self._buckets[namespace] = bucket
+
+            bucket["vectors"] = np.vstack([bucket["vectors"], vector])[-self.max_per_course:]
+            bucket["answers"] = (bucket["answers"] + [answer])[-self.max_per_course:]
+            bucket["created"] = (bucket["created"] + [time.monotonic()])[-self.max_per_course:]
+
+    def invalidate(self, course_id: int):
+        """Free a course's cached answers now; the version change would strand them anyway"""
+        namespace = f"course_{course_id}"
+        with self._lock:
+            self._buckets.pop(namespace, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "courses": len(self._buckets),
+            "entries": sum(len(b["answers"]) for b in self._buckets.values()),
+            "threshold": self.threshold,
+        }
+
+
+answer_cache = AnswerCache(ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_PER_COURSE)
@@ -0,0 +1,179 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BM25_DIR = os.path.join(os.getenv("DATA_DIR", "data"), "bm25")
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# A lexical result is "confident" when the top chunk contains a rare query term
+# (exact names, section codes, emails), covers most of the query's IDF mass and
+# clearly beats the runner-up
+LEXICAL_MAX_DF = int(os.getenv("LEXICAL_MAX_DF", "3"))
+LEXICAL_COVERAGE = float(os.getenv("LEXICAL_COVERAGE", "0.8"))
+LEXICAL_MARGIN = float(os.getenv("LEXICAL_MARGIN", "1.5"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[@._-][a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it me my of on or "
+    "the this to was what when where which who will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens; compound tokens (emails, file names) also yield their parts"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if len(token) < 2 and not token.isdigit():
+            continue
+        if token not in _STOPWORDS:
+            tokens.append(token)
+        if any(sep in token for sep in "@._-"):
+            tokens.extend(part for part in re.split(r"[@._-]", token) if part and part not in _STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over one course's chunks, keyed by the same ids as the vectors.
+    Only term statistics are kept; chunk bodies and fields live in the content store.
+    """
+
+    def __init__(self, docs: dict):
+        # docs: vector id -> {"tf": {term: count}, "length": int}
+        self.docs = docs
+        self.postings = {}
+        for doc_id, doc in docs.items():
+            for term, tf in doc["tf"].items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+        total = sum(doc["length"] for doc in docs.values())
+        self.avg_length = total / len(docs) if docs else 0.0
+
+    @classmethod
+    def build(cls, items: dict) -> "BM25Index":
+        """Index {vector id: chunk dict with "text"}"""
+        docs = {}
+        for doc_id, item in items.items():
+            tokens = tokenize(item["text"])
+            docs[doc_id] = {"tf": dict(Counter(tokens)), "length": len(tokens)}
+        return cls(docs)
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.docs) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int = 10):
+        """
+        Return (matches, confident) with matches shaped like vector-store matches,
+        minus the metadata: content_store.hydrate fills it in
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.docs:
+            return [], False
+
+        scores = Counter()
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_id, tf in postings.items():
+                norm = 1 - BM25_B + BM25_B * self.docs[doc_id]["length"] / self.avg_length
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+        ranked = scores.most_common(top_k)
+        matches = [{"id": doc_id, "score": score, "metadata": {}} for doc_id, score in ranked]
+        return matches, self._confident(terms, ranked)
+
+    def _confident(self, terms, ranked) -> bool:
+        if not ranked:
+            return False
+        top_id, top_score = ranked[0]
+        top_terms = self.docs[top_id]["tf"]
+        if not any(t in top_terms and len(self.postings[t]) <= LEXICAL_MAX_DF for t in terms):
+            return False
+        query_idf = sum(self.idf(t) for t in terms)
+        covered = sum(self.idf(t) for t in terms if t in top_terms)
+        if not query_idf or covered / query_idf < LEXICAL_COVERAGE:
+            return False
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        return top_score >= LEXICAL_MARGIN * runner_up
+
+    def to_json(self) -> dict:
+        return {"docs": self.docs}
+
+
+def reciprocal_rank_fusion(*result_lists, top_k: int = 10):
+    """Fuse ranked match lists by RRF; the fused score replaces each match's score"""
+    fused, matches = Counter(), {}
+    for results in result_lists:
+        for rank, match in enumerate(results):
+            fused[match["id"]] += 1.0 / (RRF_K + rank + 1)
+            matches.setdefault(match["id"], match)
+    return [
+        {"id": doc_id, "score": score, "metadata": matches[doc_id]["metadata"]}
+        for doc_id, score in fused.most_common(top_k)
+    ]
+
+
+# --- Persistence: one JSON file per course, reloaded when another worker rewrites it ---
+# These read and write whole files: call them through run_blocking from async code
+_loaded = {}
+_lock = threading.Lock()
+
+
+def _index_path(course_id: int) -> str:
+    return os.path.join(BM25_DIR, f"course_{course_id}.json")
+
+
+def save_index(course_id: int, items: dict):
+    index = BM25Index.build(items)
+    os.makedirs(BM25_DIR, exist_ok=True)
+    path = _index_path(course_id)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(index.to_json(), f)
+    os.replace(f"{path}.tmp", path)
+    with _lock:
+        _loaded[course_id] = (os.path.getmtime(path), index)
+
+
+def delete_index(course_id: int):
+    with _lock:
+        _loaded.pop(course_id, None)
+    try:
+        os.remove(_index_path(course_id))
+    except FileNotFoundError:
+        pass
+
+
+def load_index(course_id: int):
+    path = _index_path(course_id)
+    try:
+        mtime = os.path.getmtime(path)
+    except FileNotFoundError:
+        return None
+    with _lock:
+        cached = _loaded.get(course_id)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(path) as f:
+        docs = json.load(f)["docs"]
+    # Files written before the index was slimmed down also hold every chunk's metadata and text
+    index = BM25Index({doc_id: {"tf": doc["tf"], "length": doc["length"]} for doc_id, doc in docs.items()})
+    with _lock:
+        _loaded[course_id] = (mtime, index)
+    return index
+
+
+def lexical_search(course_id: int, query: str, top_k: int = 10):
+    """BM25 search over a course; ([], False) when the course has no lexical index yet"""
+    index = load_index(course_id)
+    if index is None:
+        return [], False
+    return index.search(query, top_k)
@@ -0,0 +1,135 @@
+import os
+import json
+import zlib
+import sqlite3
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Chunk bodies live here, keyed by vector id, so vector metadata only carries
+# small filterable fields (type, dates, names) instead of ~2KB of text each.
+# Each row also keeps those fields, so a chunk can be rebuilt without the
+# vector store (BM25 hits, delta-sync carry-over).
+CONTENT_DB = os.path.join(os.getenv("DATA_DIR", "data"), "content.sqlite3")
+CONTENT_COMPRESSION_LEVEL = int(os.getenv("CONTENT_COMPRESSION_LEVEL", "6"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id TEXT PRIMARY KEY,         -- vector id
+    namespace TEXT NOT NULL,
+    body BLOB NOT NULL,          -- zlib-compressed UTF-8 text
+    metadata TEXT                -- JSON of the chunk's other fields; NULL in stores that predate it
+);
+CREATE INDEX IF NOT EXISTS chunks_by_namespace ON chunks (namespace);
+"""
+
+# SQLite caps bound parameters per statement (999 on older builds)
+_MAX_PARAMS = 900
+
+# Connections are per thread: async callers go through run_blocking, so each pool thread gets its own
+_local = threading.local()
+
+
+def _db() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(CONTENT_DB) or ".", exist_ok=True)
+        conn = sqlite3.connect(CONTENT_DB)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        if "metadata" not in {row[1] for row in conn.execute("PRAGMA table_info(chunks)")}:
+            try:
+                conn.execute("ALTER TABLE chunks ADD COLUMN metadata TEXT")
+            except sqlite3.OperationalError:
+                pass  # another connection added it first
+        _local.conn = conn
+    return conn
+
+
+def _metadata_json(chunk: dict) -> str:
+    return json.dumps({k: v for k, v in chunk.items() if k != "text"})
+
+
+def put_chunks(namespace: str, chunks: dict):
+    """Store {vector id: chunk dict with "text"} for one namespace, replacing existing rows"""
+    rows = [
+        (
+            vid,
+            namespace,
+            zlib.compress(chunk["text"].encode("utf-8"), CONTENT_COMPRESSION_LEVEL),
+            _metadata_json(chunk),
+        )
+        for vid, chunk in chunks.items()
+    ]
+    conn = _db()
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)", rows)
+
+
+def backfill_metadata(namespace: str, chunks: dict):
+    """Record the fields of chunks stored before rows kept them, from {vector id: chunk dict}"""
+    conn = _db()
+    legacy = conn.execute("SELECT id FROM chunks WHERE namespace = ? AND metadata IS NULL", (namespace,))
+    rows = [(_metadata_json(chunks[vid]), vid) for (vid,) in legacy.fetchall() if vid in chunks]
+    if rows:
+        with conn:
+            conn.executemany("UPDATE chunks SET metadata = ? WHERE id = ?", rows)
+
+
+def get_chunks(ids, require_metadata: bool = False) -> dict:
+    """
+    Batch-fetch {vector id: chunk dict (its stored fields plus "text")}.
+    Unknown ids are simply absent, as are rows without stored fields when
+    `require_metadata` is set (otherwise those come back as just the text).
+    """
+    ids = list(dict.fromkeys(ids))
+    found = {}
+    for i in range(0, len(ids), _MAX_PARAMS):
+        batch = ids[i:i + _MAX_PARAMS]
+        cursor = _db().execute(
+            f"SELECT id, body, metadata FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+        )
+        for vid, body, metadata in cursor:
+            if metadata is None and require_metadata:
+                continue
+            found[vid] = {**json.loads(metadata or "{}"), "text": zlib.decompress(body).decode("utf-8")}
+    return found
+
+
+def delete_chunks(ids):
+    ids = list(ids)
+    conn = _db()
+    with conn:
+        for i in range(0, len(ids), _MAX_PARAMS):
+            batch = ids[i:i + _MAX_PARAMS]
+            conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+
+
+def delete_namespace(namespace: str):
+    conn = _db()
+    with conn:
+        conn.execute("DELETE FROM chunks WHERE namespace = ?", (namespace,))
+
+
+def hydrate(matches: list[dict]) -> list[dict]:
+    """
+    Fill in metadata["text"] for matches whose vectors carry slim metadata,
+    and the stored fields for BM25 hits, which carry none. Matches that
+    already have text (legacy vectors) are kept as is; ones whose body is
+    missing are dropped.
+    """
+    missing = [m["id"] for m in matches if "text" not in m.get("metadata", {})]
+    if not missing:
+        return matches
+    chunks = get_chunks(missing)
+    hydrated = []
+    for m in matches:
+        metadata = m.get("metadata", {})
+        if "text" not in metadata:
+            if m["id"] not in chunks:
+                continue
+            # Copy: the local vector store hands out its own metadata dicts
+            m = {**m, "metadata": {**chunks[m["id"]], **metadata}}
+        hydrated.append(m)
+    return hydrated
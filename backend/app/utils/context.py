@@ -0,0 +1,105 @@
+import os
+from dotenv import load_dotenv
+from app.utils.tokens import count_tokens, MESSAGE_OVERHEAD_TOKENS
+
+load_dotenv()
+
+# Token budgets for the parts of the chat prompt we control
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1000"))
+HISTORY_MESSAGES = int(os.getenv("HISTORY_MESSAGES", "5"))
+
+# chunk_text repeats the trailing sentences of a chunk at the start of the next
+# one; this much of the earlier chunk's tail is enough to find the seam
+_SEAM_CHARS = 50
+
+
+def _stitch(a: dict, b: dict):
+    """Join chunk b onto the preceding chunk a of the same item, dropping the repeated overlap"""
+    ma, mb = a["metadata"], b["metadata"]
+    if mb["chunk_index"] != ma.get("last_chunk_index", ma["chunk_index"]) + 1:
+        return None
+    tail = ma["text"][-_SEAM_CHARS:]
+    seam = mb["text"].find(tail)
+    if seam < 0:
+        return None
+    return {
+        **a,
+        "score": max(a.get("score", 0), b.get("score", 0)),
+        "metadata": {**ma, "text": ma["text"] + mb["text"][seam + len(tail):], "last_chunk_index": mb["chunk_index"]},
+    }
+
+
+def merge_overlapping(matches: list[dict]):
+    """
+    Drop duplicate chunks and stitch adjacent chunks of the same assignment,
+    announcement or page into one passage. Returns (matches by score, merged count).
+    """
+    merged, seen, groups, passages = 0, set(), {}, []
+    for m in matches:
+        metadata = m["metadata"]
+        if metadata["text"] in seen:
+            merged += 1
+            continue
+        seen.add(metadata["text"])
+        parent = metadata.get("name") or metadata.get("title")
+        if parent is None or "chunk_index" not in metadata:
+            passages.append(m)
+        else:
+            groups.setdefault((metadata.get("type"), parent), []).append(m)
+
+    for group in groups.values():
+        group.sort(key=lambda m: m["metadata"]["chunk_index"])
+        current = group[0]
+        for m in group[1:]:
+            stitched = _stitch(current, m)
+            if stitched is None:
+                passages.append(current)
+                current = m
+            else:
+                current = stitched
+                merged += 1
+        passages.append(current)
+
+    passages.sort(key=lambda m: m.get("score", 0), reverse=True)
+    return passages, merged
+
+
+def pack(items: list, budget: int, text=lambda item: item, in_order: bool = False):
+    """
+    Greedily keep items, in the given (highest value first) order, whose text
+    still fits the token budget; with in_order=True, stop at the first one that
+    doesn't, so the kept items are a prefix of the list. Returns (kept items,
+    dropped count, tokens used).
+    """
+    kept, used = [], 0
+    for item in items:
+        tokens = count_tokens(text(item))
+        if used + tokens <= budget:
+            kept.append(item)
+            used += tokens
+        elif in_order:
+            break
+    return kept, len(items) - len(kept), used
+
+
+def trim_history(history: list[dict], budget: int = HISTORY_TOKEN_BUDGET, limit: int = HISTORY_MESSAGES):
+    """
+    Most recent history messages (at most `limit`) that fit the budget, after a
+    leading summary message if it fits too; returns (messages, tokens)
+    """
+    summary = history[:1] if history and history[0]["role"] == "system" else []
+    turns = history[len(summary):]
+    kept, used = [], 0
+    for h in reversed(turns[-limit:] if limit else []):
+        tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(h["content"])
+        if used + tokens > budget:
+            break
+        kept.append({"role": h["role"], "content": h["content"]})
+        used += tokens
+    for h in summary:
+        tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(h["content"])
+        if used + tokens <= budget:
+            kept.append({"role": h["role"], "content": h["content"]})
+            used += tokens
+    return kept[::-1], used
@@ -0,0 +1,164 @@
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEADLINES_DB = os.path.join(os.getenv("DATA_DIR", "data"), "deadlines.sqlite3")
+SNIPPET_CHARS = 400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    course_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,          -- 'assignment' (due_at) or 'announcement' (posted_at)
+    at INTEGER NOT NULL,         -- epoch seconds
+    title TEXT NOT NULL,
+    points REAL,
+    snippet TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_by_time ON events (course_id, kind, at);
+CREATE TABLE IF NOT EXISTS indexed_courses (
+    course_id INTEGER PRIMARY KEY,
+    indexed_at INTEGER NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def _db() -> sqlite3.Connection:
+    # sqlite3 connections are per thread; WAL lets readers and the ingest writer overlap
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(DEADLINES_DB) or ".", exist_ok=True)
+        conn = sqlite3.connect(DEADLINES_DB)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def parse_canvas_time(value: str):
+    """Canvas ISO-8601 timestamp ("2025-03-01T06:59:59Z") -> epoch seconds"""
+    if not value:
+        return None
+    try:
+        return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        return None
+
+
+def replace_course_events(course_id: int, items):
+    """Rebuild a course's rows from ingest chunk dicts (first chunk of each assignment/announcement)"""
+    rows = []
+    for item in items:
+        if item.get("chunk_index", 0) != 0:
+            continue
+        if item["type"] == "assignment":
+            at = parse_canvas_time(item.get("due_date"))
+            title = item.get("name", "Untitled")
+        elif item["type"] == "announcement":
+            at = parse_canvas_time(item.get("posted_date"))
+            title = item.get("title", "Untitled")
+        else:
+            continue
+        if at is not None:
+            rows.append((course_id, item["type"], at, title, item.get("points"), item["text"][:SNIPPET_CHARS]))
+
+    conn = _db()
+    with conn:
+        conn.execute("DELETE FROM events WHERE course_id = ?", (course_id,))
+        conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.execute(
+            "INSERT OR REPLACE INTO indexed_courses VALUES (?, ?)",
+            (course_id, int(datetime.now().timestamp())),
+        )
+
+
+def delete_course_events(course_id: int):
+    conn = _db()
+    with conn:
+        conn.execute("DELETE FROM events WHERE course_id = ?", (course_id,))
+        conn.execute("DELETE FROM indexed_courses WHERE course_id = ?", (course_id,))
+
+
+def is_indexed(course_id: int) -> bool:
+    row = _db().execute("SELECT 1 FROM indexed_courses WHERE course_id = ?", (course_id,)).fetchone()
+    return row is not None
+
+
+def events_between(course_id: int, kind: str, start: datetime, end: datetime, limit: int = 50):
+    """Rows of one kind with start <= time < end, oldest first"""
+    cursor = _db().execute(
+        "SELECT at, title, points, snippet FROM events "
+        "WHERE course_id = ? AND kind = ? AND at >= ? AND at < ? ORDER BY at LIMIT ?",
+        (course_id, kind, int(start.timestamp()), int(end.timestamp()), limit),
+    )
+    return [
+        {"date": datetime.fromtimestamp(at), "title": title, "points": points, "text": snippet}
+        for at, title, points, snippet in cursor
+    ]
+
+
+# --- Date-range questions ("what's due this week?") ---
+_ANNOUNCEMENT_RE = re.compile(r"\b(announce\w*|posted|news|updates?)\b", re.I)
+_ASSIGNMENT_RE = re.compile(r"\b(due|deadlines?|assignments?|homework|hw|submit\w*|upcoming)\b", re.I)
+_RANGE_RES = [
+    ("today", re.compile(r"\b(today|tonight)\b", re.I)),
+    ("tomorrow", re.compile(r"\btomorrow\b", re.I)),
+    ("next_week", re.compile(r"\bnext\s+week\b", re.I)),
+    ("this_week", re.compile(r"\b(this|the)\s+week\b", re.I)),
+    ("this_month", re.compile(r"\b(this|the)\s+month\b", re.I)),
+    ("days", re.compile(r"\b(?:next|coming|past|last)\s+(\d{1,2})\s+days\b", re.I)),
+    ("recent", re.compile(r"\b(upcoming|recent(?:ly)?|latest|soon)\b", re.I)),
+]
+
+
+def parse_date_range(message: str, now: datetime = None):
+    """
+    Map a date-range question to (kind, start, end, label), or None.
+    Assignment ranges look forward from now; announcement ranges look back.
+    """
+    now = now or datetime.now()
+    if _ANNOUNCEMENT_RE.search(message):
+        kind = "announcement"
+    elif _ASSIGNMENT_RE.search(message):
+        kind = "assignment"
+    else:
+        return None
+
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = today - timedelta(days=today.weekday())
+    for name, pattern in _RANGE_RES:
+        match = pattern.search(message)
+        if not match:
+            continue
+        if name == "today":
+            start, end, label = today, today + timedelta(days=1), "today"
+        elif name == "tomorrow":
+            start, end, label = today + timedelta(days=1), today + timedelta(days=2), "tomorrow"
+        elif name == "next_week":
+            start, end, label = week_start + timedelta(days=7), week_start + timedelta(days=14), "next week"
+        elif name == "this_week":
+            start, end, label = week_start, week_start + timedelta(days=7), "this week"
+        elif name == "this_month":
+            start = today.replace(day=1)
+            end = (start + timedelta(days=32)).replace(day=1)
+            label = "this month"
+        elif name == "days":
+            days = int(match.group(1))
+            start, end, label = (now, now + timedelta(days=days), f"the next {days} days") if kind == "assignment" \
+                else (now - timedelta(days=days), now, f"the past {days} days")
+        else:
+            start, end, label = (now, now + timedelta(days=14), "the next two weeks") if kind == "assignment" \
+                else (now - timedelta(days=14), now, "the past two weeks")
+
+        if kind == "assignment":
+            start = max(start, now)  # only what is still due
+        else:
+            end = min(end, now)
+        return kind, start, end, label
+    return None
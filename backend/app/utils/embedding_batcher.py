@@ -0,0 +1,95 @@
+import os
+import asyncio
+from dotenv import load_dotenv
+from app.utils.embedding_cache import normalize_text
+from app.utils.metrics import inc
+
+load_dotenv()
+
+# How long the first query of a batch waits for others to join it
+QUERY_EMBED_WINDOW_MS = float(os.getenv("QUERY_EMBED_WINDOW_MS", "5"))
+QUERY_EMBED_MAX_BATCH = int(os.getenv("QUERY_EMBED_MAX_BATCH", "64"))
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding calls into multi-input requests.
+
+    Texts queued within `window` seconds of the first (or until `max_batch` are
+    waiting) go out as one call to `embed_batch(texts) -> vectors`. Identical
+    texts (after whitespace/case normalization, as in the embedding cache) share
+    one slot and one future, whether the original is still queued or already
+    in flight.
+    """
+
+    def __init__(self, embed_batch, window: float, max_batch: int):
+        self.embed_batch = embed_batch
+        self.window = window
+        self.max_batch = max_batch
+        self._futures = {}  # normalized text -> future, while queued or in flight
+        self._queue = []
+        self._timer = None
+        self._tasks = set()
+        self.requests = 0
+        self.deduplicated = 0
+        self.batches = 0
+        self.texts = 0
+
+    async def embed(self, text: str) -> list[float]:
+        self.requests += 1
+        key = normalize_text(text)
+        future = self._futures.get(key)
+        if future is not None:
+            self.deduplicated += 1
+            inc("query_embeddings_deduplicated")
+        else:
+            loop = asyncio.get_running_loop()
+            future = self._futures[key] = loop.create_future()
+            self._queue.append((key, text))
+            if len(self._queue) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        # Shielded so one caller giving up doesn't cancel the result for the others
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._queue = self._queue, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: list):
+        self.batches += 1
+        self.texts += len(batch)
+        inc("query_embedding_batches")
+        inc("query_embedding_texts", len(batch))
+        try:
+            vectors = await self.embed_batch([text for _, text in batch])
+        except Exception as e:
+            for key, _ in batch:
+                future = self._futures.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+                    # Mark it retrieved in case every waiter was cancelled
+                    future.exception()
+        else:
+            for (key, _), vector in zip(batch, vectors):
+                future = self._futures.pop(key)
+                if not future.done():
+                    future.set_result(vector)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "deduplicated": self.deduplicated,
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+        }
@@ -0,0 +1,139 @@
+import os
+import re
+import base64
+import hashlib
+import struct
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+EMBED_CACHE_DTYPE = os.getenv("EMBED_CACHE_DTYPE", "float32")  # or "float16"
+EMBED_CACHE_REDIS = os.getenv("EMBED_CACHE_REDIS", "0") == "1"
+EMBED_CACHE_TTL = int(os.getenv("EMBED_CACHE_TTL", str(7 * 24 * 3600)))
+
+_STRUCT_CODES = {"float32": "f", "float16": "e"}
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case so trivially different questions share a key"""
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by model + normalized text.
+    Vectors are kept as packed float32/float16 bytes: an in-process LRU bounded
+    by total byte size, plus an optional Redis tier shared across workers.
+    """
+
+    def __init__(self, max_bytes: int, dtype: str = "float32", redis=None, ttl: int = EMBED_CACHE_TTL):
+        if dtype not in _STRUCT_CODES:
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+        self.max_bytes = max_bytes
+        self.dtype = dtype
+        self.redis = redis
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def key(self, model: str, text: str) -> str:
+        digest = hashlib.sha256(f"{model}\0{normalize_text(text)}".encode()).hexdigest()
+        return f"emb:{model}:{self.dtype}:{digest}"
+
+    def pack(self, vector) -> bytes:
+        return struct.pack(f"<{len(vector)}{_STRUCT_CODES[self.dtype]}", *vector)
+
+    def unpack(self, blob: bytes) -> list[float]:
+        code = _STRUCT_CODES[self.dtype]
+        return list(struct.unpack(f"<{len(blob) // struct.calcsize(code)}{code}", blob))
+
+    # --- in-process tier ---
+    def _get_local(self, key: str):
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is not None:
+                self._entries.move_to_end(key)
+            return blob
+
+    def _put_local(self, key: str, blob: bytes):
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = blob
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def get(self, model: str, text: str):
+        """Look up the in-process tier only (for sync callers)"""
+        blob = self._get_local(self.key(model, text))
+        if blob is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.unpack(blob)
+
+    def put(self, model: str, text: str, vector):
+        self._put_local(self.key(model, text), self.pack(vector))
+
+    # --- in-process + Redis tiers ---
+    async def aget(self, model: str, text: str):
+        """Look up the in-process tier, then Redis (promoting hits into memory)"""
+        key = self.key(model, text)
+        blob = self._get_local(key)
+        if blob is not None:
+            self.hits += 1
+            return self.unpack(blob)
+
+        if self.redis is not None:
+            stored = await self.redis.get(key)
+            if stored:
+                # Upstash's REST API is string-only, so packed bytes travel as base64
+                blob = base64.b64decode(stored)
+                self._put_local(key, blob)
+                self.redis_hits += 1
+                return self.unpack(blob)
+
+        self.misses += 1
+        return None
+
+    async def aput(self, model: str, text: str, vector):
+        key = self.key(model, text)
+        blob = self.pack(vector)
+        self._put_local(key, blob)
+        if self.redis is not None:
+            await self.redis.set(key, base64.b64encode(blob).decode(), ex=self.ttl)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.redis_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "dtype": self.dtype,
+        }
+
+
+def _redis_tier():
+    if not EMBED_CACHE_REDIS:
+        return None
+    from app.utils.memory_store import memory_store
+    return memory_store
+
+
+embedding_cache = EmbeddingCache(EMBED_CACHE_MAX_BYTES, EMBED_CACHE_DTYPE, redis=_redis_tier())
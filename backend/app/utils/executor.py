@@ -0,0 +1,42 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Clients without a usable asyncio API (Pinecone data plane) run here instead
+# of on the event loop. The pool is bounded so a burst of requests queues
+# instead of spawning unbounded threads.
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "32"))
+# CPU-bound work (HTML parsing, chunking, tokenizing) runs in worker processes
+# so it neither blocks the event loop nor contends for the GIL
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 1)))
+
+_executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_IO_WORKERS,
+    thread_name_prefix="blocking-io",
+)
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking client call on the shared bounded thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+_process_pool = None
+
+
+async def run_cpu(fn, *args):
+    """Run a picklable CPU-bound function on the shared process pool (created on first use)"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=CPU_WORKERS)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_process_pool, fn, *args)
+
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
@@ -0,0 +1,153 @@
+import os
+import json
+import hashlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATA_DIR = os.getenv("DATA_DIR", "data")
+MANIFEST_DIR = os.path.join(DATA_DIR, "manifests")
+# Manifests written before embedding profiles existed hold full-size text-embedding-3-large vectors
+LEGACY_EMBEDDING_PROFILE = "text-embedding-3-large@3072"
+
+
+def content_hash(item: dict) -> str:
+    """Stable hash of a chunk's embedded text and metadata"""
+    payload = json.dumps(item, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def vector_id(course_id: int, item: dict) -> str:
+    """Content-derived vector id: unchanged chunks keep their id across re-ingests"""
+    return f"{course_id}-{content_hash(item)}"
+
+
+def _manifest_path(course_id: int) -> str:
+    return os.path.join(MANIFEST_DIR, f"course_{course_id}.json")
+
+
+def _pending_path(course_id: int) -> str:
+    return os.path.join(MANIFEST_DIR, f"course_{course_id}.pending")
+
+
+def _read(course_id: int):
+    try:
+        with open(_manifest_path(course_id)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load_manifest(course_id: int, embedding_profile: str = None):
+    """
+    Return the vector ids stored for a course by the last ingest, or None if
+    never ingested (or ingested with a different embedding profile)
+    """
+    manifest = _read(course_id)
+    if manifest is None:
+        return None
+    if embedding_profile and manifest.get("embedding_profile", LEGACY_EMBEDDING_PROFILE) != embedding_profile:
+        return None
+    return set(manifest["vector_ids"])
+
+
+# course_id -> ((mtime_ns, size) of the manifest, version)
+_index_versions = {}
+
+
+def index_version(course_id: int) -> str:
+    """
+    Fingerprint of a course's indexed chunks (a hash of its manifest's vector
+    ids), or "" if it isn't ingested. Read from disk, so every worker sees a
+    re-ingest; the manifest is only parsed again after it changes.
+    """
+    try:
+        stat = os.stat(_manifest_path(course_id))
+    except FileNotFoundError:
+        return ""
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _index_versions.get(course_id)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    manifest = _read(course_id) or {}
+    version = hashlib.sha256("\n".join(manifest.get("vector_ids", [])).encode()).hexdigest()[:16]
+    _index_versions[course_id] = (stamp, version)
+    return version
+
+
+def load_sync_state(course_id: int) -> dict:
+    """
+    What the last ingest saw in Canvas: "sources" maps each Canvas object
+    ("assignments:42") to its vector ids, and "high_water" holds the newest
+    updated_at/posted_at per resource. Empty for courses ingested before
+    delta syncs existed.
+    """
+    manifest = _read(course_id) or {}
+    return {"sources": manifest.get("sources", {}), "high_water": manifest.get("high_water", {})}
+
+
+def record_pending(course_id: int, vector_ids):
+    """
+    Log vector ids before they are upserted. Until the next manifest is saved
+    they may or may not be in the store, so a sync that fails part-way can't
+    leave vectors the manifest doesn't know about.
+    """
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    with open(_pending_path(course_id), "a") as f:
+        f.write("".join(f"{vid}\n" for vid in vector_ids))
+
+
+def load_pending(course_id: int) -> set:
+    """Ids logged by record_pending since the last saved manifest"""
+    try:
+        with open(_pending_path(course_id)) as f:
+            return {line.strip() for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+def _clear_pending(course_id: int):
+    try:
+        os.remove(_pending_path(course_id))
+    except FileNotFoundError:
+        pass
+
+
+def list_manifests() -> list[int]:
+    """Ids of every course with a manifest, i.e. every ingested course"""
+    try:
+        names = os.listdir(MANIFEST_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        int(name[len("course_"):-len(".json")])
+        for name in names
+        if name.startswith("course_") and name.endswith(".json")
+    )
+
+
+def save_manifest(course_id: int, vector_ids, embedding_profile: str = None, sources: dict = None,
+                  high_water: dict = None):
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    path = _manifest_path(course_id)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        manifest = {"course_id": course_id, "vector_ids": sorted(vector_ids)}
+        if embedding_profile:
+            manifest["embedding_profile"] = embedding_profile
+        if sources is not None:
+            manifest["sources"] = {key: sorted(vids) for key, vids in sorted(sources.items())}
+        if high_water is not None:
+            manifest["high_water"] = high_water
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)  # atomic, so a crashed ingest never leaves half a manifest
+    # The manifest now accounts for every id the sync wrote or deleted
+    _clear_pending(course_id)
+
+
+def delete_manifest(course_id: int):
+    try:
+        os.remove(_manifest_path(course_id))
+    except FileNotFoundError:
+        pass
+    _clear_pending(course_id)
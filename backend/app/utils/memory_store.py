@@ -0,0 +1,268 @@
+import os
+import time
+from dotenv import load_dotenv
+from app.utils.metrics import LatencyHistogram, observe
+
+load_dotenv()
+
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "upstash")  # "upstash", "redis" or "local"
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+# The local backend purges expired keys after this many writes
+LOCAL_SWEEP_EVERY = 1000
+
+
+class Pipeline:
+    """Commands queued on a store and sent in one round trip by `exec()`"""
+
+    def __init__(self, store: "MemoryStore"):
+        self.store = store
+        self.commands = []
+
+    def _queue(self, command, *args, **kwargs):
+        self.commands.append((command, args, kwargs))
+        return self
+
+    def get(self, key):
+        return self._queue("get", key)
+
+    def set(self, key, value, ex: int = None):
+        return self._queue("set", key, value, ex=ex)
+
+    def rpush(self, key, *values):
+        return self._queue("rpush", key, *values)
+
+    def lrange(self, key, start: int, stop: int):
+        return self._queue("lrange", key, start, stop)
+
+    def ltrim(self, key, start: int, stop: int):
+        return self._queue("ltrim", key, start, stop)
+
+    def expire(self, key, seconds: int):
+        return self._queue("expire", key, seconds)
+
+    async def exec(self) -> list:
+        return await self.store._timed("pipeline", self.store._execute(self.commands))
+
+
+class MemoryStore:
+    """
+    The slice of the Redis API used for session memory and shared caches.
+    Every operation (and whole pipelines) is timed into a per-operation latency
+    histogram so backends can be compared on the same workload.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.latency = {}
+
+    async def _run(self, command: str, *args, **kwargs):
+        raise NotImplementedError
+
+    async def _execute(self, commands: list) -> list:
+        raise NotImplementedError
+
+    async def _timed(self, op: str, awaitable):
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            elapsed = time.perf_counter() - start
+            self.latency.setdefault(op, LatencyHistogram()).observe(elapsed)
+            observe("memory_store_seconds", elapsed, backend=self.name, op=op)
+
+    async def get(self, key):
+        return await self._timed("get", self._run("get", key))
+
+    async def set(self, key, value, ex: int = None):
+        return await self._timed("set", self._run("set", key, value, ex=ex))
+
+    async def delete(self, *keys):
+        return await self._timed("delete", self._run("delete", *keys))
+
+    async def lrange(self, key, start: int, stop: int):
+        return await self._timed("lrange", self._run("lrange", key, start, stop))
+
+    def pipeline(self) -> Pipeline:
+        return Pipeline(self)
+
+    async def aclose(self):
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "operations": {op: histogram.as_dict() for op, histogram in sorted(self.latency.items())},
+        }
+
+
+class UpstashMemoryStore(MemoryStore):
+    """Upstash over its REST API: one HTTPS request per command or pipeline"""
+
+    name = "upstash"
+
+    def __init__(self):
+        super().__init__()
+        self._client = None
+
+    @property
+    def client(self):
+        # Built on first use so importing the app doesn't require Upstash credentials
+        if self._client is None:
+            from upstash_redis.asyncio import Redis
+            self._client = Redis.from_env()
+        return self._client
+
+    async def _run(self, command, *args, **kwargs):
+        return await getattr(self.client, command)(*args, **kwargs)
+
+    async def _execute(self, commands):
+        pipe = self.client.pipeline()
+        for command, args, kwargs in commands:
+            getattr(pipe, command)(*args, **kwargs)
+        return await pipe.exec()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+class RedisMemoryStore(MemoryStore):
+    """Redis over TCP through a bounded connection pool (redis-py asyncio)"""
+
+    name = "redis"
+
+    def __init__(self, url: str = REDIS_URL, max_connections: int = REDIS_MAX_CONNECTIONS):
+        super().__init__()
+        self.url = url
+        self.max_connections = max_connections
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from redis.asyncio import Redis
+            self._client = Redis.from_url(self.url, max_connections=self.max_connections, decode_responses=True)
+        return self._client
+
+    async def _run(self, command, *args, **kwargs):
+        return await getattr(self.client, command)(*args, **kwargs)
+
+    async def _execute(self, commands):
+        async with self.client.pipeline(transaction=False) as pipe:
+            for command, args, kwargs in commands:
+                getattr(pipe, command)(*args, **kwargs)
+            return await pipe.execute()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class LocalMemoryStore(MemoryStore):
+    """
+    In-process dict with Redis-style TTLs for single-node deployments and
+    tests. State is per process, so it is not shared between workers.
+    """
+
+    name = "local"
+
+    def __init__(self):
+        super().__init__()
+        self._data = {}
+        self._expires = {}
+        self._writes = 0
+
+    def _alive(self, key) -> bool:
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def _written(self):
+        self._writes += 1
+        if self._writes % LOCAL_SWEEP_EVERY == 0:
+            now = time.monotonic()
+            for key in [k for k, expires in self._expires.items() if expires <= now]:
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+
+    def _get(self, key):
+        return self._data[key] if self._alive(key) else None
+
+    def _set(self, key, value, ex=None):
+        self._data[key] = value
+        if ex:
+            self._expires[key] = time.monotonic() + ex
+        else:
+            self._expires.pop(key, None)
+        self._written()
+        return True
+
+    def _delete(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                del self._data[key]
+                self._expires.pop(key, None)
+                removed += 1
+        return removed
+
+    @staticmethod
+    def _slice(length: int, start: int, stop: int) -> slice:
+        # Redis ranges are inclusive and accept negative indexes
+        start = max(0, length + start if start < 0 else start)
+        stop = length + stop if stop < 0 else stop
+        if stop < start:
+            # Still negative after resolving (e.g. lrange(0, -6) on 4 items) is empty, as in Redis
+            return slice(0, 0)
+        return slice(start, stop + 1)
+
+    def _lrange(self, key, start, stop):
+        values = self._get(key) or []
+        return values[self._slice(len(values), start, stop)]
+
+    def _rpush(self, key, *values):
+        items = self._get(key)
+        if items is None:
+            items = self._data[key] = []
+        items.extend(values)
+        self._written()
+        return len(items)
+
+    def _ltrim(self, key, start, stop):
+        items = self._get(key)
+        if items is not None:
+            items[:] = items[self._slice(len(items), start, stop)]
+            if not items:
+                self._delete(key)
+        return True
+
+    def _expire(self, key, seconds):
+        if not self._alive(key):
+            return False
+        self._expires[key] = time.monotonic() + seconds
+        return True
+
+    async def _run(self, command, *args, **kwargs):
+        return getattr(self, f"_{command}")(*args, **kwargs)
+
+    async def _execute(self, commands):
+        return [getattr(self, f"_{command}")(*args, **kwargs) for command, args, kwargs in commands]
+
+
+def create_memory_store(backend: str = MEMORY_BACKEND) -> MemoryStore:
+    if backend == "upstash":
+        return UpstashMemoryStore()
+    if backend == "redis":
+        return RedisMemoryStore()
+    if backend == "local":
+        return LocalMemoryStore()
+    raise ValueError(f"Unknown MEMORY_BACKEND: {backend}")
+
+
+memory_store = create_memory_store()
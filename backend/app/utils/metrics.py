@@ -0,0 +1,143 @@
+import os
+import time
+import bisect
+import threading
+import contextlib
+import contextvars
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Upper bounds in seconds, Prometheus-style; the last bucket catches everything else
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float("inf"))
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram: O(1) to record, percentiles read off the buckets"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile (the largest finite bound if it overflowed)"""
+        if not self.count:
+            return 0.0
+        target, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound if bound != float("inf") else self.buckets[-2]
+        return self.buckets[-2]
+
+    def as_dict(self) -> dict:
+        cumulative, seen = {}, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = seen
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "buckets": cumulative,
+        }
+
+
+# --- Process-wide registry, rendered in Prometheus text format at /metrics ---
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+_histograms = {}
+_counters = {}
+_lock = threading.Lock()
+# Spans finished while handling the current request, for the Server-Timing header
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _key(name: str, labels: dict):
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name: str, seconds: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = LatencyHistogram()
+        histogram.observe(seconds)
+
+
+def inc(name: str, value: float = 1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+@contextlib.contextmanager
+def span(stage: str):
+    """Time a block into stage_seconds{stage=...} and the current request's Server-Timing"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("stage_seconds", elapsed, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+@contextlib.contextmanager
+def request_timings():
+    """Collect the spans of one request; yields the list they are appended to"""
+    timings = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def server_timing_header(timings) -> str:
+    return ", ".join(f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in timings)
+
+
+def _labels(labels, extra=()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render_prometheus() -> str:
+    with _lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+
+    lines, typed = [], set()
+    for (name, labels), value in counters:
+        if name not in typed:
+            lines.append(f"# TYPE {name}_total counter")
+            typed.add(name)
+        lines.append(f"{name}_total{_labels(labels)} {value}")
+    for (name, labels), histogram in histograms:
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        seen = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            seen += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_labels(labels, [('le', le)])} {seen}")
+        lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,177 @@
+import os
+import time
+import asyncio
+from dotenv import load_dotenv
+from app.utils.tokens import count_embedding_tokens
+from app.utils.metrics import inc, observe
+
+load_dotenv()
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "50"))
+# OpenAI allows 2048 inputs and 300k tokens per embeddings request; keep some headroom
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "250000"))
+EMBED_BULK_BATCH_SIZE = int(os.getenv("EMBED_BULK_BATCH_SIZE", "2048"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+
+_DONE = object()
+
+
+async def merge(*sources):
+    """Interleave several async generators, yielding items as soon as any produces one"""
+    queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+    async def drain(source):
+        try:
+            async for item in source:
+                await queue.put((item, None))
+            await queue.put((_DONE, None))
+        except Exception as e:
+            await queue.put((_DONE, e))
+
+    tasks = [asyncio.create_task(drain(source)) for source in sources]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                remaining -= 1
+                continue
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class StageStats:
+    """Item counts and busy time for one pipeline stage"""
+
+    def __init__(self):
+        self.items = 0
+        self.calls = 0
+        self.busy_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "calls": self.calls,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+
+async def embed_and_upsert(
+    items,
+    embed_batch,
+    upsert_batch,
+    embed_batch_size: int = EMBED_BATCH_SIZE,
+    embed_batch_tokens: int = EMBED_BATCH_TOKENS,
+    max_in_flight: int = EMBED_MAX_IN_FLIGHT,
+    upsert_batch_size: int = UPSERT_BATCH_SIZE,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+    stats: dict = None,
+):
+    """
+    Stream items (dicts with "id", "namespace" and "text") through embedding and upsert.
+
+    Stages are connected by bounded queues, so at most a few batches of
+    vectors are held in memory and each stage starts as soon as the previous
+    one produces work:
+
+        items -> [batcher] -> embed_queue -> [max_in_flight embedders]
+              -> upsert_queue -> [upserter]
+
+    Embedding batches are packed up to embed_batch_size items or
+    embed_batch_tokens tokens, whichever comes first, regardless of which
+    namespace the items belong to; upserts are grouped per namespace.
+
+    embed_batch(texts) -> list of vectors; upsert_batch(namespace, vectors) stores them.
+    Pass `stats` (name -> StageStats) to observe progress while it runs.
+    Returns per-stage stats.
+    """
+    embed_queue = asyncio.Queue(maxsize=queue_size)
+    upsert_queue = asyncio.Queue(maxsize=queue_size)
+    if stats is None:
+        stats = {}
+    stats.setdefault("embed", StageStats())
+    stats.setdefault("upsert", StageStats())
+    started = time.perf_counter()
+
+    async def batcher():
+        batch, batch_tokens, total_tokens = [], 0, 0
+        async for item in items:
+            tokens = count_embedding_tokens(item["text"])
+            total_tokens += tokens
+            if batch and batch_tokens + tokens > embed_batch_tokens:
+                await embed_queue.put(batch)
+                batch, batch_tokens = [], 0
+            batch.append(item)
+            batch_tokens += tokens
+            if len(batch) >= embed_batch_size:
+                await embed_queue.put(batch)
+                batch, batch_tokens = [], 0
+        if batch:
+            await embed_queue.put(batch)
+        inc("embedding_tokens", total_tokens, source="ingest")
+        for _ in range(max_in_flight):
+            await embed_queue.put(_DONE)
+
+    async def embedder():
+        while (batch := await embed_queue.get()) is not _DONE:
+            t0 = time.perf_counter()
+            values = await embed_batch([item["text"] for item in batch])
+            elapsed = time.perf_counter() - t0
+            observe("stage_seconds", elapsed, stage="ingest.embed")
+            stats["embed"].busy_seconds += elapsed
+            stats["embed"].calls += 1
+            stats["embed"].items += len(batch)
+            await upsert_queue.put([
+                (item["namespace"], {
+                    "id": item["id"],
+                    "values": vector,
+                    "metadata": {k: v for k, v in item.items() if k not in ("id", "namespace")},
+                })
+                for item, vector in zip(batch, values)
+            ])
+
+    async def embedders():
+        await asyncio.gather(*(embedder() for _ in range(max_in_flight)))
+        await upsert_queue.put(_DONE)
+
+    async def flush(namespace, vectors):
+        t0 = time.perf_counter()
+        await upsert_batch(namespace, vectors)
+        elapsed = time.perf_counter() - t0
+        observe("stage_seconds", elapsed, stage="ingest.upsert")
+        stats["upsert"].busy_seconds += elapsed
+        stats["upsert"].calls += 1
+        stats["upsert"].items += len(vectors)
+
+    async def upserter():
+        pending = {}
+        while (vectors := await upsert_queue.get()) is not _DONE:
+            for namespace, vector in vectors:
+                batch = pending.setdefault(namespace, [])
+                batch.append(vector)
+                if len(batch) >= upsert_batch_size:
+                    await flush(namespace, pending.pop(namespace))
+        for namespace, batch in pending.items():
+            await flush(namespace, batch)
+
+    try:
+        async with asyncio.TaskGroup() as group:
+            group.create_task(batcher())
+            group.create_task(embedders())
+            group.create_task(upserter())
+    except ExceptionGroup as group_error:
+        # Surface the stage's own error (e.g. a Canvas HTTP error), not "unhandled errors in a TaskGroup"
+        error = group_error
+        while isinstance(error, ExceptionGroup):
+            error = error.exceptions[0]
+        raise error from None
+
+    result = {name: stats[name].as_dict() for name in ("embed", "upsert")}
+    result["wall_seconds"] = round(time.perf_counter() - started, 3)
+    return result
@@ -0,0 +1,145 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from app.utils.metrics import inc
+
+logger = logging.getLogger(__name__)
+
+# Returned by a fetch when the upstream answered 304 Not Modified
+NOT_MODIFIED = object()
+
+
+class _Entry:
+    __slots__ = ("value", "etag", "fetched_at")
+
+    def __init__(self, value, etag, fetched_at):
+        self.value = value
+        self.etag = etag
+        self.fetched_at = fetched_at
+
+
+class ResponseCache:
+    """
+    In-process cache of upstream responses with TTL and stale-while-revalidate.
+
+    `get(key, fetch)` returns a fresh entry straight from memory. Once it is
+    older than `ttl` (but within `ttl + stale`) the stale value is still
+    returned immediately while one background refresh runs; past that, callers
+    wait for the refresh. `fetch(etag)` gets the cached ETag so it can send
+    If-None-Match, and returns (value, etag) or NOT_MODIFIED. Concurrent misses
+    for one key share a single fetch.
+
+    Entries past the stale window are dropped, and at most `max_entries` are
+    kept, evicting the least recently used.
+    """
+
+    def __init__(self, name: str, ttl: float, stale: float, max_entries: int = 1000):
+        self.name = name
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._tasks = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.errors = 0
+        self.evictions = 0
+
+    def _count(self, result: str):
+        inc("response_cache", cache=self.name, result=result)
+
+    async def get(self, key, fetch):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            age = time.monotonic() - entry.fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                self._count("hit")
+                return entry.value
+            if age < self.ttl + self.stale:
+                self.stale_hits += 1
+                self._count("stale")
+                if key not in self._inflight:
+                    task = asyncio.create_task(self._revalidate(key, fetch))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                return entry.value
+            # Expired: refetch with no ETag rather than keep it for a user who may not return
+            del self._entries[key]
+
+        self.misses += 1
+        self._count("miss")
+        return await self._refresh(key, fetch)
+
+    async def _refresh(self, key, fetch):
+        # Single flight: later callers await the fetch already running for this key
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._inflight[key] = asyncio.ensure_future(self._fetch(key, fetch))
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _fetch(self, key, fetch):
+        entry = self._entries.get(key)
+        result = await fetch(entry.etag if entry is not None else None)
+        now = time.monotonic()
+        if result is NOT_MODIFIED and entry is not None:
+            self.not_modified += 1
+            self._count("not_modified")
+            entry.fetched_at = now
+            self._store(key, entry, now)
+            return entry.value
+        value, etag = result
+        self._store(key, _Entry(value, etag, now), now)
+        return value
+
+    def _store(self, key, entry: _Entry, now: float):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        # Inserts happen at most once per key per TTL, so sweeping expired entries here is cheap
+        expired = [k for k, e in self._entries.items() if now - e.fetched_at >= self.ttl + self.stale]
+        for k in expired:
+            del self._entries[k]
+        evicted = len(expired)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            evicted += 1
+        if evicted:
+            self.evictions += evicted
+            inc("response_cache_evictions", evicted, cache=self.name)
+
+    async def _revalidate(self, key, fetch):
+        try:
+            await self._refresh(key, fetch)
+        except Exception:
+            # Keep serving the stale copy; the next caller past the stale window retries
+            self.errors += 1
+            self._count("error")
+            logger.exception("Background refresh of the %s cache failed", self.name)
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "errors": self.errors,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "ttl": self.ttl,
+            "stale": self.stale,
+        }
@@ -0,0 +1,100 @@
+import os
+import re
+import math
+from dotenv import load_dotenv
+from app.utils.tokens import count_tokens_exact
+
+load_dotenv()
+
+# ~2000 characters of English per chunk, with a couple of sentences of overlap
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "500"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+_DROPPED_TAGS = ("script", "style")
+
+# Fastest available HTML parser: selectolax (lexbor) > lxml > BeautifulSoup's pure-Python parser
+try:
+    from selectolax.parser import HTMLParser as _SelectolaxParser
+except ImportError:
+    _SelectolaxParser = None
+try:
+    import lxml.html as _lxml_html
+    from lxml import etree as _lxml_etree
+except ImportError:
+    _lxml_html = None
+
+
+def _extract_text(html_text: str) -> str:
+    if _SelectolaxParser is not None:
+        tree = _SelectolaxParser(html_text)
+        tree.strip_tags(list(_DROPPED_TAGS))
+        return tree.text(separator=" ")
+    if _lxml_html is not None:
+        try:
+            root = _lxml_html.fromstring(html_text)
+        except _lxml_etree.ParserError:  # whitespace-only or otherwise empty document
+            return ""
+        _lxml_etree.strip_elements(root, _lxml_etree.Comment, *_DROPPED_TAGS, with_tail=False)
+        return " ".join(root.itertext())
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html_text, "html.parser")
+    for tag in soup(_DROPPED_TAGS):
+        tag.decompose()
+    return soup.get_text(separator=" ")
+
+
+def clean_html(html_text: str) -> str:
+    """Remove HTML tags and extra whitespace"""
+    if not html_text:
+        return ""
+    if "<" not in html_text and "&" not in html_text:
+        # Plain text: nothing to parse
+        return " ".join(html_text.split())
+    return " ".join(_extract_text(html_text).split())
+
+
+def _sentences(text: str, max_tokens: int):
+    """(sentence, tokens) pairs; sentences longer than a chunk are cut into word-aligned pieces"""
+    for sentence in _SENTENCE_END_RE.split(text):
+        tokens = count_tokens_exact(sentence)
+        if tokens <= max_tokens:
+            yield sentence, tokens
+            continue
+        words = sentence.split(" ")
+        per_piece = math.ceil(len(words) / math.ceil(tokens / max_tokens))
+        for i in range(0, len(words), per_piece):
+            piece = " ".join(words[i:i + per_piece])
+            yield piece, count_tokens_exact(piece)
+
+
+def chunk_text(text: str, max_tokens: int = None, overlap_tokens: int = None):
+    """
+    Split text into chunks of whole sentences of at most `max_tokens` tokens;
+    each chunk starts with the trailing sentences (up to `overlap_tokens`) of
+    the previous one. Every sentence is tokenized once.
+    """
+    max_tokens = max_tokens or CHUNK_MAX_TOKENS
+    overlap_tokens = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    if not text:
+        return [""]
+    text = " ".join(text.split())
+
+    chunks, current, current_tokens = [], [], 0
+    for sentence, tokens in _sentences(text, max_tokens):
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(s for s, _ in current))
+            carry, carried = [], 0
+            for s, t in reversed(current):
+                if carried + t > overlap_tokens:
+                    break
+                carry.append((s, t))
+                carried += t
+            current, current_tokens = carry[::-1], carried
+            if current_tokens + tokens > max_tokens:
+                current, current_tokens = [], 0
+        current.append((sentence, tokens))
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(s for s, _ in current))
+    return chunks
@@ -0,0 +1,66 @@
+import functools
+import tiktoken
+
+# Prompt budgets and chat token metrics are counted in the chat model's units (o200k_base)
+CHAT_MODEL = "gpt-4o-mini"
+# text-embedding-3-* input limits, and so embedding batches and chunk sizes, use cl100k_base
+EMBEDDING_ENCODING = "cl100k_base"
+
+
+@functools.lru_cache(maxsize=1)
+def _chat_encoding():
+    try:
+        return tiktoken.encoding_for_model(CHAT_MODEL)
+    except Exception:
+        # The BPE file is downloaded on first use; offline we fall back to an estimate
+        return None
+
+
+@functools.lru_cache(maxsize=1)
+def _embedding_encoding():
+    try:
+        return tiktoken.get_encoding(EMBEDDING_ENCODING)
+    except Exception:
+        return None
+
+
+def _count(encoding, text: str) -> int:
+    if encoding is None:
+        return len(text) // 3 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens the way the chat model does (or conservatively estimate offline)"""
+    return _count(_chat_encoding(), text)
+
+
+def count_embedding_tokens(text: str) -> int:
+    """Count tokens the way the embedding model does (or conservatively estimate offline)"""
+    return _count(_embedding_encoding(), text)
+
+
+def count_tokens_exact(text: str) -> int:
+    """
+    Like count_embedding_tokens, but raises instead of estimating. Chunk
+    boundaries, and through them the content-hashed vector ids, are decided by
+    these counts, so they must not depend on whether the BPE file could be downloaded.
+    """
+    encoding = _embedding_encoding()
+    if encoding is None:
+        raise RuntimeError(
+            f"tiktoken could not load {EMBEDDING_ENCODING}, which chunking needs: let it download once "
+            "or point TIKTOKEN_CACHE_DIR at a directory holding the encoding file"
+        )
+    return _count(encoding, text)
+
+
+# Chat-format framing: each message costs a few tokens on top of its content,
+# and every reply is primed with a few more
+MESSAGE_OVERHEAD_TOKENS = 3
+REPLY_PRIMING_TOKENS = 3
+
+
+def count_message_tokens(messages: list[dict]) -> int:
+    """Prompt tokens of a chat completion request"""
+    return REPLY_PRIMING_TOKENS + sum(MESSAGE_OVERHEAD_TOKENS + count_tokens(m["content"]) for m in messages)
@@ -1,67 +1,577 @@
 import os
+import json
+import threading
+import numpy as np
 from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
-from openai import OpenAI
+from app.clients import clients
+from app.utils.embedding_cache import embedding_cache
+from app.utils.executor import run_blocking
+from app.utils.content_store import put_chunks, hydrate
 
 load_dotenv()
 
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX = os.getenv("PINECONE_INDEX", "canvas-ai")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-pc = Pinecone(api_key=PINECONE_API_KEY)
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-# ✅ Create Pinecone index if it doesn't exist
-if PINECONE_INDEX not in [i["name"] for i in pc.list_indexes()]:
-    pc.create_index(
-        name=PINECONE_INDEX,
-        dimension=3072,  # dimension for text-embedding-3-large
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1"),
-    )
 
-index = pc.Index(PINECONE_INDEX)
+# --- Embedding profile: used for both ingest and queries ---
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+# text-embedding-3-* can return shortened vectors (e.g. 256/512/1024); unset keeps the native size
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+NATIVE_DIMENSIONS = {"text-embedding-3-large": 3072, "text-embedding-3-small": 1536, "text-embedding-ada-002": 1536}
+EMBEDDING_DIMENSION = EMBEDDING_DIMENSIONS or NATIVE_DIMENSIONS.get(EMBEDDING_MODEL, 3072)
+# Names the vector space: keys embedding caches and manifests, so a profile change forces a re-embed
+EMBEDDING_PROFILE = f"{EMBEDDING_MODEL}@{EMBEDDING_DIMENSION}"
+# Keyword arguments for embeddings.create()
+EMBEDDING_REQUEST = {"model": EMBEDDING_MODEL, **({"dimensions": EMBEDDING_DIMENSIONS} if EMBEDDING_DIMENSIONS else {})}
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")  # "pinecone" or "local"
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", os.path.join(os.getenv("DATA_DIR", "data"), "vectors"))
+LOCAL_VECTOR_DTYPE = os.getenv("LOCAL_VECTOR_DTYPE", "float32")  # or "float16", "int8"
+
+
+class VectorStore:
+    """
+    Interface shared by the vector backends. Mirrors the subset of the Pinecone
+    index API the app uses; query results look like Pinecone's
+    ({"matches": [{"id", "score", "metadata"}]}).
+    """
+
+    def upsert(self, vectors: list[dict], namespace: str):
+        raise NotImplementedError
+
+    def query(self, vector, top_k: int, namespace: str, include_metadata: bool = True, filter: dict = None):
+        """`filter` uses Pinecone's metadata filter syntax ($eq, $in, $gte, $and, ...)"""
+        raise NotImplementedError
+
+    def delete(self, namespace: str, ids: list[str] = None, delete_all: bool = False):
+        raise NotImplementedError
+
+    def close(self):
+        """Release connections and open files; the store reconnects if used again"""
+
+    # Async variants: network backends run on the shared blocking-IO pool
+    async def aupsert(self, vectors: list[dict], namespace: str):
+        return await run_blocking(self.upsert, vectors=vectors, namespace=namespace)
+
+    async def aquery(self, vector, top_k: int, namespace: str, include_metadata: bool = True, filter: dict = None):
+        return await run_blocking(
+            self.query, vector=vector, top_k=top_k, namespace=namespace,
+            include_metadata=include_metadata, filter=filter
+        )
+
+    async def adelete(self, namespace: str, ids: list[str] = None, delete_all: bool = False):
+        return await run_blocking(self.delete, namespace=namespace, ids=ids, delete_all=delete_all)
+
+
+class PineconeVectorStore(VectorStore):
+    """Pinecone serverless index; the index is created/connected on first use"""
+
+    def __init__(self, api_key: str, index_name: str, dimension: int = EMBEDDING_DIMENSION):
+        self.api_key = api_key
+        self.index_name = index_name
+        self.dimension = dimension
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self):
+        with self._lock:
+            if self._index is None:
+                # Imported here so the SDK only loads when Pinecone is actually used
+                from pinecone import Pinecone, ServerlessSpec
+                pc = Pinecone(api_key=self.api_key)
+                existing = {i["name"]: i for i in pc.list_indexes()}
+                if self.index_name in existing and existing[self.index_name]["dimension"] != self.dimension:
+                    raise ValueError(
+                        f"Pinecone index {self.index_name} has dimension {existing[self.index_name]['dimension']} "
+                        f"but the embedding profile produces {self.dimension}; set PINECONE_INDEX to a new index"
+                    )
+                # ✅ Create Pinecone index if it doesn't exist
+                if self.index_name not in existing:
+                    pc.create_index(
+                        name=self.index_name,
+                        dimension=self.dimension,
+                        metric="cosine",
+                        spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+                    )
+                self._index = pc.Index(self.index_name)
+            return self._index
+
+    def upsert(self, vectors, namespace):
+        return self.index.upsert(vectors=vectors, namespace=namespace)
+
+    def query(self, vector, top_k, namespace, include_metadata=True, filter=None):
+        response = self.index.query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=include_metadata,
+            namespace=namespace,
+            filter=filter,
+        )
+        # The SDK returns ScoredVector objects; callers copy and index matches as plain dicts
+        return {
+            "matches": [
+                {"id": m.id, "score": m.score, "metadata": dict(m.metadata or {})}
+                for m in response.matches
+            ]
+        }
+
+    def delete(self, namespace, ids=None, delete_all=False):
+        from pinecone.exceptions import NotFoundException
+        try:
+            if delete_all:
+                return self.index.delete(delete_all=True, namespace=namespace)
+            return self.index.delete(ids=ids, namespace=namespace)
+        except NotFoundException:
+            # Deleting from a namespace that was never written is a no-op
+            return None
+
+    def close(self):
+        # The Index owns the SDK's HTTP connection pool and request thread pool
+        with self._lock:
+            index, self._index = self._index, None
+        if index is not None and hasattr(index, "close"):
+            index.close()
+
+
+_FILTER_OPS = {
+    "$eq": lambda value, arg: value == arg,
+    "$ne": lambda value, arg: value != arg,
+    "$in": lambda value, arg: value in arg,
+    "$nin": lambda value, arg: value not in arg,
+    "$gt": lambda value, arg: value is not None and value > arg,
+    "$gte": lambda value, arg: value is not None and value >= arg,
+    "$lt": lambda value, arg: value is not None and value < arg,
+    "$lte": lambda value, arg: value is not None and value <= arg,
+}
+
+
+def matches_filter(metadata: dict, filter: dict) -> bool:
+    """Evaluate a Pinecone-style metadata filter against one metadata dict"""
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if not all(_FILTER_OPS[op](value, arg) for op, arg in condition.items()):
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+# Metadata fields the chat query planner filters on; the local store keeps them as NumPy columns
+_COLUMN_FIELDS = ("type", "due_ts", "posted_ts")
+_COLUMN_OPS = {
+    "$eq": np.equal,
+    "$ne": np.not_equal,
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class _Column:
+    """
+    One metadata field of every row: numbers as float64 (NaN when missing) or
+    strings as category codes (-1 when missing). Comparisons against NaN and
+    -1 come out as matches_filter's do against a missing value.
+    """
+
+    def __init__(self, values: np.ndarray, categories: dict = None):
+        self.values = values
+        self.categories = categories
+
+    @classmethod
+    def build(cls, metadata: list, key: str):
+        """The field as a column, or None if its values are neither all numbers nor all strings"""
+        values = [m.get(key) for m in metadata]
+        present = [v for v in values if v is not None]
+        if all(_is_number(v) for v in present):
+            return cls(np.array([np.nan if v is None else v for v in values], dtype=np.float64))
+        if all(isinstance(v, str) for v in present):
+            categories = {v: code for code, v in enumerate(dict.fromkeys(present))}
+            return cls(np.array([categories.get(v, -1) for v in values], dtype=np.int32), categories)
+        return None
+
+    def supports(self, op: str, arg) -> bool:
+        if op in ("$in", "$nin"):
+            if not isinstance(arg, (list, tuple)):
+                return False
+            args = arg
+        else:
+            args = [arg]
+        if self.categories is None:
+            return (op in _COLUMN_OPS or op in ("$in", "$nin")) and all(_is_number(a) for a in args)
+        return op in ("$eq", "$ne", "$in", "$nin") and all(isinstance(a, str) for a in args)
+
+    def mask(self, op: str, arg) -> np.ndarray:
+        if self.categories is not None:
+            if op in ("$in", "$nin"):
+                arg = [self.categories[a] for a in arg if a in self.categories]
+            else:
+                arg = self.categories.get(arg, -2)  # a code no row has
+        if op in ("$in", "$nin"):
+            hit = np.isin(self.values, arg)
+            return hit if op == "$in" else ~hit
+        return _COLUMN_OPS[op](self.values, arg)
+
+
+def _columnar(filter: dict, columns: dict) -> bool:
+    """Whether every condition of the filter can be evaluated on the columns"""
+    for key, condition in filter.items():
+        if key in ("$and", "$or"):
+            if not all(_columnar(sub, columns) for sub in condition):
+                return False
+        elif key not in columns:
+            return False
+        else:
+            ops = condition if isinstance(condition, dict) else {"$eq": condition}
+            if not all(columns[key].supports(op, arg) for op, arg in ops.items()):
+                return False
+    return True
+
+
+def _column_mask(filter: dict, columns: dict, rows: int) -> np.ndarray:
+    """Vectorized matches_filter over every row; the filter must be _columnar"""
+    mask = np.ones(rows, dtype=bool)
+    for key, condition in filter.items():
+        if key == "$and":
+            for sub in condition:
+                mask &= _column_mask(sub, columns, rows)
+        elif key == "$or":
+            matched = np.zeros(rows, dtype=bool)
+            for sub in condition:
+                matched |= _column_mask(sub, columns, rows)
+            mask &= matched
+        else:
+            ops = condition if isinstance(condition, dict) else {"$eq": condition}
+            for op, arg in ops.items():
+                mask &= columns[key].mask(op, arg)
+    return mask
+
+
+class _LocalNamespace:
+    """
+    Unit-normalized vectors of one namespace plus their ids and metadata.
+    Never modified once published: writers build a new one and swap it in.
+    """
+
+    def __init__(self, dtype):
+        self.dtype = dtype
+        self.ids = []
+        self.metadata = []
+        self.rows = {}
+        self.matrix = None
+        self.scales = None  # per-row dequantization factors for int8 matrices
+        self.columns = {}  # _COLUMN_FIELDS as _Columns, for vectorized filters
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector index: one NumPy matrix per namespace, persisted as a raw
+    float32/float16/int8 file that is memory-mapped on load, with ids and
+    metadata in a JSON sidecar. int8 rows are scaled per vector (scales kept in
+    a .scales file), a quarter of the float32 size. Cosine top-k is a single
+    matrix-vector product plus argpartition, so typical course sizes query in
+    well under a millisecond.
+
+    Upserts append new rows to the files and overwrite changed rows in place,
+    so ingest cost grows with the batch rather than the namespace. Writers are
+    serialized by their own lock; queries only take the short lock that guards
+    the swap to a namespace's new snapshot.
+    """
+
+    def __init__(self, path: str, dtype: str = "float32"):
+        if dtype not in ("float32", "float16", "int8"):
+            raise ValueError(f"Unsupported local vector dtype: {dtype}")
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self._namespaces = {}
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+
+    def _files(self, namespace: str):
+        base = os.path.join(self.path, namespace)
+        return f"{base}.vectors", f"{base}.meta.json", f"{base}.scales"
+
+    def _load(self, namespace: str) -> _LocalNamespace:
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                ns = self._namespaces[namespace] = self._open(namespace)
+            return ns
+
+    def _open(self, namespace: str, dtype=None, ids=None, metadata=None, dim=None) -> _LocalNamespace:
+        """Namespace snapshot over the files on disk; reads the sidecar unless given its contents"""
+        vectors_path, meta_path, scales_path = self._files(namespace)
+        if ids is None and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            dtype, ids, metadata, dim = np.dtype(meta["dtype"]), meta["ids"], meta["metadata"], meta["dim"]
+
+        ns = _LocalNamespace(dtype if dtype is not None else self.dtype)
+        if ids:
+            ns.ids = ids
+            ns.metadata = metadata
+            ns.rows = {vid: row for row, vid in enumerate(ids)}
+            for key in _COLUMN_FIELDS:
+                column = _Column.build(metadata, key)
+                if column is not None:
+                    ns.columns[key] = column
+            ns.matrix = np.memmap(vectors_path, dtype=ns.dtype, mode="r", shape=(len(ids), dim))
+            if ns.dtype == np.int8:
+                ns.scales = np.memmap(scales_path, dtype=np.float32, mode="r", shape=(len(ids),))
+        return ns
+
+    def _publish(self, namespace: str, ns: _LocalNamespace):
+        with self._lock:
+            self._namespaces[namespace] = ns
+
+    @staticmethod
+    def _write_rows(path: str, row_bytes: int, count: int, updates: list, appended: np.ndarray):
+        """Overwrite `updates` [(row, values)] in place and append `appended` after the first `count` rows"""
+        with open(path, "r+b" if count and os.path.exists(path) else "wb") as f:
+            # Anything past `count` rows is left from an interrupted write the sidecar never listed
+            f.truncate(count * row_bytes)
+            for row, values in updates:
+                f.seek(row * row_bytes)
+                f.write(values.tobytes())
+            f.seek(count * row_bytes)
+            f.write(appended.tobytes())
+
+    def _write_meta(self, namespace: str, dtype: np.dtype, dim: int, ids: list, metadata: list):
+        _, meta_path, _ = self._files(namespace)
+        # dumps() rather than dump(): the C encoder, so the GIL isn't held through a slow Python loop
+        with open(f"{meta_path}.tmp", "w") as f:
+            f.write(json.dumps({"dtype": dtype.name, "dim": dim, "ids": ids, "metadata": metadata}))
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    def _remove_files(self, namespace: str):
+        for path in self._files(namespace):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def _normalize(values) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float32)
+        norms = np.linalg.norm(values, axis=-1, keepdims=True)
+        return values / np.where(norms == 0, 1, norms)
+
+    @classmethod
+    def _encode(cls, values, dtype: np.dtype):
+        """Normalized rows in the storage dtype, plus per-row scales when quantizing to int8"""
+        values = cls._normalize(values)
+        if dtype != np.int8:
+            return values.astype(dtype), None
+        # Symmetric per-vector quantization: the largest component maps to ±127
+        scales = np.abs(values).max(axis=1) / 127
+        scales[scales == 0] = 1
+        return np.rint(values / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def upsert(self, vectors, namespace):
+        if not vectors:
+            return
+        with self._write_lock:
+            ns = self._load(namespace)
+            values, scales = self._encode([v["values"] for v in vectors], ns.dtype)
+            dim = values.shape[1]
+            if ns.matrix is not None and ns.matrix.shape[1] != dim:
+                raise ValueError(
+                    f"{namespace} holds {ns.matrix.shape[1]}-dim vectors, got {dim}; re-ingest with full=true"
+                )
+
+            count = len(ns.ids)
+            ids, metadata, rows = list(ns.ids), list(ns.metadata), dict(ns.rows)
+            updated, appended = [], []
+            # The last copy of an id repeated within the batch wins
+            for i in {v["id"]: i for i, v in enumerate(vectors)}.values():
+                vid, meta = vectors[i]["id"], vectors[i].get("metadata", {})
+                row = rows.get(vid)
+                if row is None:
+                    rows[vid] = len(ids)
+                    ids.append(vid)
+                    metadata.append(meta)
+                    appended.append(i)
+                else:
+                    metadata[row] = meta
+                    updated.append((row, i))
+
+            # Rows overwritten in place may show up in a query already running; the sidecar,
+            # written last, is what makes appended rows visible after a restart
+            os.makedirs(self.path, exist_ok=True)
+            vectors_path, _, scales_path = self._files(namespace)
+            self._write_rows(
+                vectors_path, dim * ns.dtype.itemsize, count,
+                [(row, values[i]) for row, i in updated], values[appended],
+            )
+            if scales is not None:
+                self._write_rows(
+                    scales_path, scales.itemsize, count,
+                    [(row, scales[i]) for row, i in updated], scales[appended],
+                )
+            self._write_meta(namespace, ns.dtype, dim, ids, metadata)
+            self._publish(namespace, self._open(namespace, ns.dtype, ids, metadata, dim))
+
+    def query(self, vector, top_k, namespace, include_metadata=True, filter=None):
+        ns = self._load(namespace)
+        matrix, scales, ids, metadata = ns.matrix, ns.scales, ns.ids, ns.metadata
+        if matrix is None or top_k <= 0:
+            return {"matches": []}
+
+        if filter:
+            if _columnar(filter, ns.columns):
+                rows = np.flatnonzero(_column_mask(filter, ns.columns, len(ids)))
+            else:
+                rows = np.array(
+                    [row for row, meta in enumerate(metadata) if matches_filter(meta, filter)], dtype=np.intp
+                )
+            if not len(rows):
+                return {"matches": []}
+        else:
+            rows = None
+
+        candidates = matrix if rows is None else matrix[rows]
+        # Upcast float16/int8 rows so the dot products accumulate in float32
+        scores = candidates.astype(np.float32, copy=False) @ self._normalize(vector)
+        if scales is not None:
+            scores *= scales if rows is None else scales[rows]
+        if len(scores) > top_k:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+
+        matches = []
+        for i in top:
+            row = i if rows is None else rows[i]
+            match = {"id": ids[row], "score": float(scores[i])}
+            if include_metadata:
+                match["metadata"] = metadata[row]
+            matches.append(match)
+        return {"matches": matches}
+
+    def delete(self, namespace, ids=None, delete_all=False):
+        with self._write_lock:
+            if delete_all:
+                self._remove_files(namespace)
+                # Forget it entirely: the next write starts over in the configured dtype
+                with self._lock:
+                    self._namespaces.pop(namespace, None)
+                return
+            ns = self._load(namespace)
+            if not ids or ns.matrix is None:
+                return
+            drop = {ns.rows[vid] for vid in ids if vid in ns.rows}
+            if not drop:
+                return
+
+            keep = [row for row in range(len(ns.ids)) if row not in drop]
+            if not keep:
+                self._remove_files(namespace)
+                self._publish(namespace, _LocalNamespace(ns.dtype))
+                return
+            # Removing rows compacts the files, so this one rewrites them
+            vectors_path, _, scales_path = self._files(namespace)
+            np.asarray(ns.matrix)[keep].tofile(f"{vectors_path}.tmp")
+            os.replace(f"{vectors_path}.tmp", vectors_path)
+            if ns.scales is not None:
+                np.asarray(ns.scales)[keep].tofile(f"{scales_path}.tmp")
+                os.replace(f"{scales_path}.tmp", scales_path)
+            kept_ids = [ns.ids[row] for row in keep]
+            kept_metadata = [ns.metadata[row] for row in keep]
+            dim = ns.matrix.shape[1]
+            self._write_meta(namespace, ns.dtype, dim, kept_ids, kept_metadata)
+            self._publish(namespace, self._open(namespace, ns.dtype, kept_ids, kept_metadata, dim))
+
+    def close(self):
+        # Unmaps the loaded matrices; the next query of a namespace reloads it
+        with self._write_lock, self._lock:
+            self._namespaces = {}
+
+    async def aquery(self, vector, top_k, namespace, include_metadata=True, filter=None):
+        # Sub-millisecond and never waits on a write: cheaper to run inline than to hop
+        # threads, except the first query of a namespace, which loads it from disk, and
+        # filters on fields without a column, which test every row's metadata in Python
+        ns = self._namespaces.get(namespace)
+        if ns is None or (filter and not _columnar(filter, ns.columns)):
+            return await super().aquery(
+                vector, top_k=top_k, namespace=namespace, include_metadata=include_metadata, filter=filter
+            )
+        return self.query(
+            vector=vector, top_k=top_k, namespace=namespace, include_metadata=include_metadata, filter=filter
+        )
+
+
+def create_vector_store(backend: str = VECTOR_BACKEND) -> VectorStore:
+    if backend == "local":
+        return LocalVectorStore(LOCAL_VECTOR_DIR, LOCAL_VECTOR_DTYPE)
+    if backend == "pinecone":
+        return PineconeVectorStore(PINECONE_API_KEY, PINECONE_INDEX)
+    raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
+
 
 
 def embed_text(text: str) -> list[float]:
     """Generate and return an embedding vector for the given text."""
-    resp = client.embeddings.create(
-        model="text-embedding-3-large",
-        input=text,
-    )
-    return resp.data[0].embedding
+    return embed_texts([text])[0]
+
+
+def embed_texts(texts: list[str]) -> list[list[float]]:
+    """Embed several texts, calling OpenAI once for all cache misses."""
+    results = [embedding_cache.get(EMBEDDING_PROFILE, t) for t in texts]
+    missing = [i for i, emb in enumerate(results) if emb is None]
+    if missing:
+        resp = clients.openai_sync.embeddings.create(
+            input=[texts[i] for i in missing],
+            **EMBEDDING_REQUEST
+        )
+        for i, emb_data in zip(missing, resp.data):
+            results[i] = emb_data.embedding
+            embedding_cache.put(EMBEDDING_PROFILE, texts[i], emb_data.embedding)
+    return results
 
 
 def upsert_chunks(course_id: int, chunks: list[dict]):
     """
-    Upload multiple text chunks as vectors to Pinecone for a course.
+    Upload multiple text chunks as vectors to the vector store for a course.
     Each chunk = { "id": str, "text": str, "metadata": dict }
+    The text itself is kept in the content store, not in the vector metadata.
     """
+    namespace = f"course_{course_id}"
+    put_chunks(namespace, {ch["id"]: {**ch.get("metadata", {}), "text": ch["text"]} for ch in chunks})
     vectors = []
-    for ch in chunks:
-        emb = embed_text(ch["text"])
+    embeddings = embed_texts([ch["text"] for ch in chunks])
+    for ch, emb in zip(chunks, embeddings):
         vectors.append(
             {
                 "id": ch["id"],
                 "values": emb,
                 "metadata": {
                     "course_id": str(course_id),
-                    "text": ch["text"],
                     **ch.get("metadata", {}),
                 },
             }
         )
-    index.upsert(vectors=vectors, namespace=f"course_{course_id}")
+    clients.vector_store.upsert(vectors=vectors, namespace=namespace)
 
 
 def query_course(course_id: int, query: str, top_k: int = 5):
-    """Query Pinecone namespace for a course using semantic similarity search."""
+    """Query a course namespace using semantic similarity search."""
     q_emb = embed_text(query)
-    res = index.query(
+    res = clients.vector_store.query(
         vector=q_emb,
         top_k=top_k,
         include_metadata=True,
         namespace=f"course_{course_id}",
     )
-    return res.matches
+    return hydrate(res["matches"])
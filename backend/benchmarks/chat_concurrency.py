@@ -0,0 +1,71 @@
+"""
+Concurrency benchmark for POST /chat against local fakes.
+
+Runs N simultaneous chats through chat_with_canvas twice:
+  - "blocking": fakes that sleep on the event loop, like the old sync clients
+  - "async":    fakes that await (OpenAI/memory store) or block a pool thread (vector store)
+
+Usage (from backend/):
+    python -m benchmarks.chat_concurrency --requests 200 --latency-ms 50
+"""
+import time
+import asyncio
+import argparse
+
+from benchmarks.fakes import FakeOpenAI, FakeRedis, FakeVectorStore, latency_summary
+
+SEED_MATCHES = [
+    ("1-essay", {"type": "assignment", "due_ts": 4070908800,
+                 "text": "Assignment: Essay | Due: 2099-01-01T00:00:00Z | Points: 10"}),
+    ("1-welcome", {"type": "announcement",
+                   "text": "Announcement: Welcome | Date: 2024-01-01T00:00:00Z | Hello"}),
+]
+
+
+def load_chat_module():
+    from app.routes import chat
+    return chat
+
+
+async def run(chat, n: int, mode: str, latency: float):
+    blocking = mode == "blocking"
+    chat.clients.openai = openai = FakeOpenAI(latency, blocking)
+    chat.memory_store = FakeRedis(latency / 5, blocking)
+    chat.clients.vector_store = FakeVectorStore(latency, blocking)
+    for vid, metadata in SEED_MATCHES:
+        chat.clients.vector_store.seed("course_1", vid, openai.vector(metadata["text"]), metadata)
+
+    async def one(i):
+        start = time.perf_counter()
+        # Distinct questions so the embedding/answer caches don't short-circuit the pipeline
+        message = f"What's due for {mode} project {i}?"
+        await chat.chat_with_canvas(chat.ChatRequest(course_id=1, session_id=f"s{i}", message=message))
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i) for i in range(n)))
+    elapsed = time.perf_counter() - start
+    summary = latency_summary(latencies)
+    print(f"{mode:>8}: {n} chats in {elapsed:.2f}s | {n / elapsed:.1f} chats/s | "
+          f"p50 {summary['p50']:.0f}ms | p95 {summary['p95']:.0f}ms")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--blocking-requests", type=int, default=20,
+                        help="the blocking baseline is serial, so run fewer requests")
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+    chat = load_chat_module()
+    blocking = asyncio.run(run(chat, args.blocking_requests, "blocking", latency))
+    concurrent = asyncio.run(run(chat, args.requests, "async", latency))
+    speedup = (args.requests / concurrent) / (args.blocking_requests / blocking)
+    print(f"throughput gain: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
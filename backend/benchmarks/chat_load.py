@@ -0,0 +1,138 @@
+"""
+Chat latency under concurrent load against fakes seeded by a real ingest.
+
+A synthetic course is ingested through the real pipeline (so the vector store,
+BM25 index, content store and deadline index are all populated), then a mix of
+questions is sent through /chat (or /chat/stream) with a fixed concurrency.
+Sessions are reused, so history, caches and the answer cache behave as in
+production. Reports throughput and p50/p95/p99 latency (and time to first
+token when streaming).
+
+Usage (from backend/):
+    python -m benchmarks.chat_load --requests 500 --concurrency 50 --latency-ms 50
+    python -m benchmarks.chat_load --stream
+"""
+import time
+import random
+import asyncio
+import argparse
+
+from benchmarks.fakes import (
+    FakeCanvas, FakeOpenAI, FakeRedis, FakeVectorStore, synthetic_course, latency_summary,
+)
+
+QUESTIONS = [
+    "What's due this week?",
+    "What assignments are due in the next 7 days?",
+    "Any announcements posted recently?",
+    "When is Project {n} due and how many points is it worth?",
+    "What does Project {n} ask us to submit?",
+    "Who is the instructor and what is their email?",
+    "What is the late work policy?",
+    "How is the final report graded?",
+    "Summarize discussion {n}.",
+]
+
+
+async def seed_course(course: dict, vector_store: FakeVectorStore, openai: FakeOpenAI):
+    """Ingest one synthetic course into the fakes with no simulated latency"""
+    from app.routes import ingest
+    from app.canvas_api import CanvasClient, CANVAS_CONCURRENCY, CANVAS_MAX_CONNECTIONS, CANVAS_TIMEOUT
+
+    course_id = course["course"]["id"]
+    ingest.canvas = CanvasClient(
+        CANVAS_CONCURRENCY, CANVAS_MAX_CONNECTIONS, CANVAS_TIMEOUT,
+        transport=FakeCanvas({course_id: course}).transport(),
+    )
+    ingest.clients.openai = openai
+    ingest.clients.vector_store = vector_store
+    result = await ingest.sync_course(course_id, full=True)
+    await ingest.canvas.aclose()
+    return result["stats"]["total_chunks"]
+
+
+async def run(args):
+    from app.routes import chat
+
+    course = synthetic_course(1, args.assignments, args.announcements, args.discussions, args.people)
+    openai = FakeOpenAI(0.0)
+    vector_store = FakeVectorStore(0.0)
+    chunks = await seed_course(course, vector_store, openai)
+
+    openai.latency = args.latency_ms / 1000
+    vector_store.latency = vector_store.upsert_latency = args.store_latency_ms / 1000
+    chat.clients.openai = openai
+    chat.clients.vector_store = vector_store
+    chat.memory_store = FakeRedis(args.redis_latency_ms / 1000)
+
+    rng = random.Random(args.seed)
+    questions = [
+        rng.choice(QUESTIONS).format(n=rng.randint(1, max(1, args.assignments)))
+        for _ in range(args.requests)
+    ]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    first_tokens = []
+
+    async def one(i, message):
+        req = chat.ChatRequest(course_id=1, session_id=f"s{i % args.sessions}", message=message)
+        async with semaphore:
+            start = time.perf_counter()
+            if not args.stream:
+                await chat.chat_with_canvas(req)
+            else:
+                response = await chat.chat_with_canvas_stream(req)
+                first_token = None
+                async for frame in response.body_iterator:
+                    if first_token is None and '"token"' in frame:
+                        first_token = time.perf_counter() - start
+                if first_token is not None:
+                    first_tokens.append(first_token)
+            return time.perf_counter() - start
+
+    chat_calls_before = openai.chat_calls
+    embed_calls_before = openai.embed_calls
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i, q) for i, q in enumerate(questions)))
+    elapsed = time.perf_counter() - start
+
+    summary = latency_summary(latencies)
+    print(f"seeded 1 course with {chunks} chunks")
+    print(
+        f"{args.requests} chats at concurrency {args.concurrency} in {elapsed:.2f}s | "
+        f"{args.requests / elapsed:.1f} chats/s | p50 {summary['p50']:.0f}ms | p95 {summary['p95']:.0f}ms | "
+        f"p99 {summary['p99']:.0f}ms | max {summary['max']:.0f}ms"
+    )
+    if first_tokens:
+        ttft = latency_summary(first_tokens)
+        print(f"time to first token: p50 {ttft['p50']:.0f}ms | p95 {ttft['p95']:.0f}ms | p99 {ttft['p99']:.0f}ms")
+    print(
+        f"model calls: {openai.chat_calls - chat_calls_before} completions, "
+        f"{openai.embed_calls - embed_calls_before} embeddings | "
+        f"answer cache: {chat.answer_cache.stats()}"
+    )
+    batches = chat.query_embedder.stats()
+    print(
+        f"query embeddings: {batches['requests']} requests, {batches['deduplicated']} deduplicated, "
+        f"{batches['batches']} batches (mean size {batches['mean_batch_size']:.1f})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=100, help="distinct chat sessions the requests rotate over")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="OpenAI latency per call")
+    parser.add_argument("--store-latency-ms", type=float, default=20.0, help="vector store latency per call")
+    parser.add_argument("--redis-latency-ms", type=float, default=5.0, help="memory store latency per round trip")
+    parser.add_argument("--assignments", type=int, default=60)
+    parser.add_argument("--announcements", type=int, default=30)
+    parser.add_argument("--discussions", type=int, default=20)
+    parser.add_argument("--people", type=int, default=3)
+    parser.add_argument("--stream", action="store_true", help="use /chat/stream and report time to first token")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Retrieval recall vs. index size for embedding profiles (dimensions x storage dtype).
+
+A fixture course is chunked by the real ingest item builders, embedded once at
+the model's full size, and then, for every profile, the vectors are truncated
+to the requested dimensions (text-embedding-3 vectors are trained so that a
+truncated, re-normalized prefix matches what `dimensions=` returns), loaded
+into a LocalVectorStore with the profile's dtype and queried. Recall@k is the
+overlap with the full-size float32 top-k, so 1.0 means the cheaper profile
+retrieves exactly the same chunks.
+
+Without --openai the vectors come from an offline bag-of-words embedding, which
+is only good for checking quantization and the script itself; use --openai (and
+--cache to embed just once) to pick a profile for real.
+
+Usage (from backend/):
+    python -m benchmarks.embedding_profiles --dims 3072 1024 512 256 --dtypes float32 float16 int8
+    OPENAI_API_KEY=sk-... python -m benchmarks.embedding_profiles --openai --cache data/profile-eval.npz
+"""
+import os
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import tempfile
+
+import numpy as np
+
+from benchmarks.fakes import synthetic_course, latency_summary
+from benchmarks.chat_load import QUESTIONS
+
+
+def fixture_chunks(args) -> list[str]:
+    from app.routes import ingest
+
+    course = synthetic_course(1, args.assignments, args.announcements, args.discussions, args.people)
+    items = ingest.syllabus_items(course["course"]["name"], course["course"]["syllabus_body"])
+    for build, key in (
+        (ingest.assignment_items, "assignments"),
+        (ingest.announcement_items, "announcements"),
+        (ingest.discussion_items, "discussions"),
+        (ingest.person_items, "users"),
+    ):
+        items.extend(ingest.build_items(build, course[key]))
+    return [item["text"] for item in items]
+
+
+def fixture_queries(args) -> list[str]:
+    rng = random.Random(args.seed)
+    return [
+        rng.choice(QUESTIONS).format(n=rng.randint(1, max(1, args.assignments)))
+        for _ in range(args.queries)
+    ]
+
+
+def bag_of_words(texts: list[str], dim: int) -> np.ndarray:
+    """Offline stand-in for a real model: texts sharing words get similar vectors"""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            seed = int.from_bytes(hashlib.sha256(word.encode()).digest()[:8], "little")
+            vectors[row] += np.random.default_rng(seed).standard_normal(dim, dtype=np.float32)
+    return vectors
+
+
+async def openai_embeddings(texts: list[str], model: str, batch_size: int = 256) -> np.ndarray:
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(api_key=os.environ["OPENAI_API_KEY"])
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        response = await client.embeddings.create(model=model, input=texts[i:i + batch_size])
+        vectors.extend(d.embedding for d in response.data)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+async def load_embeddings(args, chunks: list[str], queries: list[str]):
+    if args.cache and os.path.exists(args.cache):
+        cached = np.load(args.cache)
+        if cached["chunks"].shape[0] == len(chunks) and cached["queries"].shape[0] == len(queries):
+            return cached["chunks"], cached["queries"]
+
+    if args.openai:
+        vectors = await openai_embeddings(chunks + queries, args.model)
+    else:
+        vectors = bag_of_words(chunks + queries, max(args.dims))
+    chunk_vectors, query_vectors = vectors[:len(chunks)], vectors[len(chunks):]
+    if args.cache:
+        np.savez(args.cache, chunks=chunk_vectors, queries=query_vectors)
+    return chunk_vectors, query_vectors
+
+
+def evaluate(store_cls, chunk_vectors, query_vectors, dim: int, dtype: str, top_k: int, reference=None):
+    """Top-k ids per query and query latencies for one profile"""
+    store = store_cls(tempfile.mkdtemp(prefix="profile-eval-"), dtype)
+    store.upsert(
+        [{"id": str(i), "values": v[:dim]} for i, v in enumerate(chunk_vectors)],
+        namespace="eval",
+    )
+    results, latencies = [], []
+    for q in query_vectors:
+        start = time.perf_counter()
+        matches = store.query(vector=q[:dim], top_k=top_k, namespace="eval", include_metadata=False)["matches"]
+        latencies.append(time.perf_counter() - start)
+        results.append([m["id"] for m in matches])
+
+    size = sum(os.path.getsize(os.path.join(store.path, f)) for f in os.listdir(store.path) if not f.endswith(".json"))
+    recall = None
+    if reference is not None:
+        recall = np.mean([len(set(r) & set(ref)) / len(ref) for r, ref in zip(results, reference) if ref])
+    return results, latencies, size, recall
+
+
+async def run(args):
+    from app.utils.vector_store import LocalVectorStore
+
+    chunks, queries = fixture_chunks(args), fixture_queries(args)
+    chunk_vectors, query_vectors = await load_embeddings(args, chunks, queries)
+    full_dim = chunk_vectors.shape[1]
+    dims = sorted({d for d in args.dims if d <= full_dim}, reverse=True)
+    print(f"{len(chunks)} chunks, {len(queries)} queries, full size {full_dim} dims, recall@{args.top_k}")
+
+    reference, _, _, _ = evaluate(LocalVectorStore, chunk_vectors, query_vectors, full_dim, "float32", args.top_k)
+    baseline = None
+    for dim in dims:
+        for dtype in args.dtypes:
+            _, latencies, size, recall = evaluate(
+                LocalVectorStore, chunk_vectors, query_vectors, dim, dtype, args.top_k, reference
+            )
+            baseline = baseline or size
+            summary = latency_summary(latencies)
+            print(
+                f"{dim:>5} dims {dtype:>7}: recall {recall:.3f} | {size / len(chunks):>7.0f} B/vector | "
+                f"{size / 1024:>8.0f} KiB ({size / baseline:.0%}) | query p50 {summary['p50']:.2f}ms"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dims", type=int, nargs="+", default=[3072, 1024, 512, 256])
+    parser.add_argument("--dtypes", nargs="+", default=["float32", "float16", "int8"])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--assignments", type=int, default=60)
+    parser.add_argument("--announcements", type=int, default=30)
+    parser.add_argument("--discussions", type=int, default=20)
+    parser.add_argument("--people", type=int, default=3)
+    parser.add_argument("--openai", action="store_true", help="embed with the OpenAI API instead of offline")
+    parser.add_argument("--model", default="text-embedding-3-large")
+    parser.add_argument("--cache", help=".npz file to store the full-size embeddings in and reuse")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
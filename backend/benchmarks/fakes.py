@@ -0,0 +1,317 @@
+"""
+Offline fakes shared by the benchmarks: a synthetic Canvas API served through
+httpx.MockTransport, OpenAI embeddings/chat, a vector store and a memory store,
+each with configurable latency.
+
+Import this module before any `app` module: it points the app at dummy
+credentials, a local memory store and a throwaway DATA_DIR.
+"""
+import os
+import math
+import time
+import random
+import asyncio
+import hashlib
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Dummy credentials so the app modules can be imported without a .env
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("PINECONE_API_KEY", "bench")
+os.environ.setdefault("PINECONE_INDEX", "bench")
+os.environ.setdefault("CANVAS_BASE_URL", "https://canvas.test")
+os.environ.setdefault("CANVAS_ACCESS_TOKEN", "bench")
+os.environ.setdefault("MEMORY_BACKEND", "local")
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="canvas-bench-"))
+
+import httpx  # noqa: E402
+from app.utils.memory_store import LocalMemoryStore  # noqa: E402
+from app.utils.vector_store import VectorStore, matches_filter  # noqa: E402
+
+_WORDS = (
+    "students will submit a written report describing the design analysis and results of the "
+    "project including references figures and a short reflection on what they learned grading "
+    "follows the rubric posted on canvas late work loses ten percent per day unless an extension "
+    "was approved in advance by the instructor office hours are held weekly in the lab"
+).split()
+
+
+class _Obj:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+async def _wait(latency: float, blocking: bool):
+    if blocking:
+        time.sleep(latency)
+    else:
+        await asyncio.sleep(latency)
+
+
+def latency_summary(latencies: list[float]) -> dict:
+    """p50/p95/p99/max in milliseconds"""
+    ordered = sorted(latencies)
+    if not ordered:
+        return {}
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1] * 1000}
+
+
+# --- Synthetic Canvas ---
+def _html(rng: random.Random, chars: int) -> str:
+    paragraphs, size = [], 0
+    while size < chars:
+        sentences = []
+        for _ in range(rng.randint(3, 6)):
+            words = rng.choices(_WORDS, k=rng.randint(8, 20))
+            sentences.append(" ".join(words).capitalize() + ".")
+        paragraph = " ".join(sentences)
+        paragraphs.append(f"<p>{paragraph}</p>")
+        size += len(paragraph)
+    return "<div>" + "".join(paragraphs) + "</div>"
+
+
+def synthetic_course(course_id: int, assignments: int = 40, announcements: int = 20, discussions: int = 10,
+                     people: int = 3, html_chars: int = 3000, seed: int = 0) -> dict:
+    """Canvas API payloads for one course; dates are spread around today"""
+    rng = random.Random(seed * 100003 + course_id)
+    now = datetime.now(timezone.utc)
+
+    def iso(dt):
+        return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    return {
+        "course": {
+            "id": course_id,
+            "name": f"BENCH {course_id}: Synthetic Course",
+            "syllabus_body": _html(rng, html_chars * 2),
+        },
+        "assignments": [
+            {
+                "id": i,
+                "name": f"Project {i}",
+                "due_at": iso(now + timedelta(days=rng.randint(-30, 60), hours=rng.randint(0, 23))),
+                "updated_at": iso(now - timedelta(days=rng.randint(1, 90))),
+                "points_possible": rng.choice([10, 20, 50, 100]),
+                "description": _html(rng, html_chars),
+            }
+            for i in range(1, assignments + 1)
+        ],
+        "announcements": [
+            {
+                "id": i,
+                "title": f"Update {i} for section {rng.randint(10000, 99999)}",
+                "posted_at": iso(now - timedelta(days=rng.randint(0, 60))),
+                "message": _html(rng, html_chars // 2),
+            }
+            for i in range(1, announcements + 1)
+        ],
+        "discussions": [
+            {
+                "id": i,
+                "title": f"Discussion {i}",
+                "posted_at": iso(now - timedelta(days=rng.randint(30, 90))),
+                "last_reply_at": iso(now - timedelta(days=rng.randint(1, 30))),
+                "message": _html(rng, html_chars // 2),
+            }
+            for i in range(1, discussions + 1)
+        ],
+        "users": [
+            {
+                "id": i,
+                "name": f"Instructor {i}",
+                "login_id": f"instructor{course_id}x{i}",
+                "enrollments": [{"type": "TeacherEnrollment" if i == 1 else "TaEnrollment"}],
+            }
+            for i in range(1, people + 1)
+        ],
+    }
+
+
+class FakeCanvas:
+    """
+    Serves synthetic courses with Canvas-style `Link` pagination; use
+    `transport()` with httpx. Honors the announcements `start_date`/`end_date`
+    filter with Canvas's defaults (the last 14 days, and 28 days past the start)
+    and discussions `order_by=recent_activity`.
+    """
+
+    _RESOURCES = {"assignments": "assignments", "discussion_topics": "discussions", "users": "users"}
+
+    def __init__(self, courses: dict, latency: float = 0.0):
+        self.courses = courses
+        self.latency = latency
+        self.requests = 0
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        path = request.url.path.strip("/").split("/")  # api, v1, courses, {id}, {resource}
+        params = request.url.params
+        if path[2] == "announcements":
+            course = self.courses[int(params["context_codes[]"].split("_")[1])]
+            start = params.get("start_date") or (datetime.now(timezone.utc) - timedelta(days=14)).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"
+            )
+            end = params.get("end_date") or (
+                datetime.fromisoformat(start.replace("Z", "+00:00")) + timedelta(days=28)
+            ).strftime("%Y-%m-%dT%H:%M:%SZ")
+            items = [a for a in course["announcements"] if start <= a["posted_at"] <= end]
+        else:
+            course = self.courses.get(int(path[3]))
+            if course is None:
+                return httpx.Response(404, json={"errors": [{"message": "not found"}]})
+            if len(path) == 4:
+                return httpx.Response(200, json=course["course"])
+            items = course[self._RESOURCES[path[4]]]
+            if params.get("order_by") == "recent_activity":
+                items = sorted(items, key=lambda d: d.get("last_reply_at") or d.get("posted_at") or "", reverse=True)
+
+        per_page = int(params.get("per_page", 10))
+        page = int(params.get("page", 1))
+        last = max(1, math.ceil(len(items) / per_page))
+        rels = [("current", page), ("first", 1), ("last", last)]
+        if page < last:
+            rels.append(("next", page + 1))
+        link = ",".join(f'<{request.url.copy_set_param("page", n)}>; rel="{rel}"' for rel, n in rels)
+        return httpx.Response(200, json=items[(page - 1) * per_page:page * per_page], headers={"Link": link})
+
+
+def touch(course: dict, count: int, rng: random.Random = None):
+    """Edit `count` assignments and post as many announcements, as a teacher would between syncs"""
+    rng = rng or random.Random(0)
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    for assignment in rng.sample(course["assignments"], min(count, len(course["assignments"]))):
+        assignment["description"] += f"<p>Clarification {rng.randint(0, 10 ** 6)}: see the rubric.</p>"
+        assignment["updated_at"] = now
+    first_id = max((a["id"] for a in course["announcements"]), default=0) + 1
+    for i in range(first_id, first_id + count):
+        course["announcements"].append({
+            "id": i,
+            "title": f"Reminder {i}",
+            "posted_at": now,
+            "message": _html(rng, 400),
+        })
+
+
+# --- OpenAI ---
+class FakeOpenAI:
+    """Embeddings and chat completions (optionally streamed) with a fixed per-call latency"""
+
+    def __init__(self, latency: float, blocking: bool = False, dim: int = 64,
+                 answer: str = "The essay is due soon."):
+        self.latency = latency
+        self.blocking = blocking
+        self.dim = dim
+        self.answer = answer
+        self.embed_calls = 0
+        self.embedded_texts = 0
+        self.chat_calls = 0
+        self.embeddings = _Obj(create=self._embed)
+        self.chat = _Obj(completions=_Obj(create=self._complete))
+
+    def vector(self, text: str) -> list[float]:
+        """Deterministic pseudo-embedding of a text"""
+        rng = random.Random(hashlib.sha256(text.encode()).digest())
+        return [rng.gauss(0, 1) for _ in range(self.dim)]
+
+    async def _embed(self, model, input, **kwargs):
+        texts = [input] if isinstance(input, str) else input
+        self.embed_calls += 1
+        self.embedded_texts += len(texts)
+        await _wait(self.latency, self.blocking)
+        return _Obj(data=[_Obj(embedding=self.vector(t)) for t in texts])
+
+    async def _complete(self, stream: bool = False, **kwargs):
+        self.chat_calls += 1
+        await _wait(self.latency, self.blocking)
+        if not stream:
+            return _Obj(choices=[_Obj(message=_Obj(content=self.answer))])
+        return self._stream()
+
+    async def _stream(self):
+        for word in self.answer.split(" "):
+            await asyncio.sleep(0)
+            yield _Obj(choices=[_Obj(delta=_Obj(content=word + " "))])
+
+
+# --- Vector store ---
+class FakeVectorStore(VectorStore):
+    """
+    Network-like vector store: every call blocks its thread for `latency`
+    (upserts scale with batch size). Queries rank by dot product.
+    With blocking=True, aquery runs on the event loop like the old sync client.
+    """
+
+    def __init__(self, latency: float, blocking: bool = False, upsert_latency: float = None):
+        self.latency = latency
+        self.blocking = blocking
+        self.upsert_latency = latency if upsert_latency is None else upsert_latency
+        self.namespaces = {}
+        self.upserted = 0
+
+    def seed(self, namespace: str, vid: str, values: list[float], metadata: dict):
+        """Insert a vector without any simulated latency"""
+        self.namespaces.setdefault(namespace, {})[vid] = (values, metadata)
+
+    def upsert(self, vectors, namespace):
+        time.sleep(self.upsert_latency)
+        ns = self.namespaces.setdefault(namespace, {})
+        for v in vectors:
+            ns[v["id"]] = (v["values"], v.get("metadata", {}))
+        self.upserted += len(vectors)
+
+    def query(self, vector, top_k, namespace, include_metadata=True, filter=None):
+        time.sleep(self.latency)
+        scored = [
+            (sum(a * b for a, b in zip(vector, values)), vid, metadata)
+            for vid, (values, metadata) in self.namespaces.get(namespace, {}).items()
+            if not filter or matches_filter(metadata, filter)
+        ]
+        scored.sort(key=lambda s: s[0], reverse=True)
+        matches = []
+        for score, vid, metadata in scored[:top_k]:
+            match = {"id": vid, "score": score}
+            if include_metadata:
+                match["metadata"] = metadata
+            matches.append(match)
+        return {"matches": matches}
+
+    def delete(self, namespace, ids=None, delete_all=False):
+        time.sleep(self.latency)
+        if delete_all:
+            self.namespaces.pop(namespace, None)
+        else:
+            ns = self.namespaces.get(namespace, {})
+            for vid in ids or []:
+                ns.pop(vid, None)
+
+    async def aquery(self, **kwargs):
+        if self.blocking:
+            return self.query(**kwargs)
+        return await super().aquery(**kwargs)
+
+
+# --- Memory store ---
+class FakeRedis(LocalMemoryStore):
+    """In-process memory store that adds a fixed per-round-trip latency"""
+
+    def __init__(self, latency: float, blocking: bool = False):
+        super().__init__()
+        # Not `latency`: MemoryStore keeps its per-operation histograms there
+        self.round_trip = latency
+        self.blocking = blocking
+
+    async def _run(self, command, *args, **kwargs):
+        await _wait(self.round_trip, self.blocking)
+        return await super()._run(command, *args, **kwargs)
+
+    async def _execute(self, commands):
+        await _wait(self.round_trip, self.blocking)
+        return await super()._execute(commands)
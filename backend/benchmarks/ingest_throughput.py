@@ -0,0 +1,101 @@
+"""
+Ingest throughput benchmark against a synthetic Canvas and fake OpenAI/vector store.
+
+Syncs N synthetic courses through the real ingest pipeline (pagination,
+cleaning, chunking, batching, embedding, upserts, manifests, BM25, deadlines),
+then syncs them again unchanged to measure the incremental path, then edits a
+few items per course and runs a delta sync that only pulls what changed.
+
+Usage (from backend/):
+    python -m benchmarks.ingest_throughput --courses 4 --assignments 80 --embed-latency-ms 200
+    python -m benchmarks.ingest_throughput --courses 8 --bulk
+"""
+import time
+import asyncio
+import argparse
+
+from benchmarks.fakes import FakeCanvas, FakeOpenAI, FakeVectorStore, synthetic_course, touch
+
+
+def load_ingest_module():
+    from app.routes import ingest
+    return ingest
+
+
+async def sync(ingest, course_ids: list[int], bulk: bool, workers: int, delta: bool = False):
+    if bulk and not delta:
+        return (await ingest.sync_courses_bulk(course_ids))["courses"]
+
+    # Same concurrency as the ingest job queue
+    semaphore = asyncio.Semaphore(workers)
+
+    async def one(course_id):
+        async with semaphore:
+            return course_id, await ingest.sync_course(course_id, delta=delta)
+
+    return dict(await asyncio.gather(*(one(course_id) for course_id in course_ids)))
+
+
+async def run(args):
+    ingest = load_ingest_module()
+    from app.canvas_api import CanvasClient, CANVAS_CONCURRENCY, CANVAS_MAX_CONNECTIONS, CANVAS_TIMEOUT
+
+    course_ids = list(range(1, args.courses + 1))
+    fake_canvas = FakeCanvas(
+        {
+            course_id: synthetic_course(
+                course_id, args.assignments, args.announcements, args.discussions, args.people, args.html_chars
+            )
+            for course_id in course_ids
+        },
+        latency=args.canvas_latency_ms / 1000,
+    )
+    ingest.canvas = CanvasClient(
+        CANVAS_CONCURRENCY, CANVAS_MAX_CONNECTIONS, CANVAS_TIMEOUT, transport=fake_canvas.transport()
+    )
+    ingest.clients.openai = openai = FakeOpenAI(args.embed_latency_ms / 1000)
+    ingest.clients.vector_store = FakeVectorStore(args.upsert_latency_ms / 1000)
+
+    for label in ("initial", "incremental", "delta"):
+        if label == "delta":
+            for course in fake_canvas.courses.values():
+                touch(course, args.changed)
+        requests_before = fake_canvas.requests
+        embed_calls_before = openai.embed_calls
+        start = time.perf_counter()
+        results = await sync(ingest, course_ids, args.bulk, ingest.INGEST_WORKERS, delta=label == "delta")
+        elapsed = time.perf_counter() - start
+
+        stats = [r["stats"] for r in results.values()]
+        chunks = sum(s["total_chunks"] for s in stats)
+        embedded = sum(s["embedded"] for s in stats)
+        print(
+            f"{label:>11}: {len(course_ids)} courses, {chunks} chunks ({embedded} embedded) in {elapsed:.2f}s | "
+            f"{chunks / elapsed:.0f} chunks/s | {embedded / elapsed:.0f} embedded/s | "
+            f"{fake_canvas.requests - requests_before} Canvas requests | "
+            f"{openai.embed_calls - embed_calls_before} embedding calls | "
+            f"{sum(s['unchanged_objects'] for s in stats)} unchanged Canvas objects carried over"
+        )
+
+    await ingest.canvas.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=4)
+    parser.add_argument("--assignments", type=int, default=60)
+    parser.add_argument("--announcements", type=int, default=30)
+    parser.add_argument("--discussions", type=int, default=20)
+    parser.add_argument("--people", type=int, default=3)
+    parser.add_argument("--html-chars", type=int, default=4000, help="approximate HTML size of each description")
+    parser.add_argument("--canvas-latency-ms", type=float, default=30.0)
+    parser.add_argument("--embed-latency-ms", type=float, default=200.0)
+    parser.add_argument("--upsert-latency-ms", type=float, default=50.0)
+    parser.add_argument("--bulk", action="store_true", help="one bulk sync with cross-course embedding batches")
+    parser.add_argument("--changed", type=int, default=3,
+                        help="assignments edited and announcements posted per course before the delta sync")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+App startup time: importing `main` plus running the FastAPI lifespan startup,
+each in a fresh interpreter (as a new worker would), with the number of
+network connections attempted along the way. Clients connect lazily, so the
+expected count is zero.
+
+Usage (from backend/):
+    python -m benchmarks.startup --runs 10
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+import benchmarks.fakes  # noqa: F401  (dummy credentials and a temp DATA_DIR, inherited by the children)
+from benchmarks.fakes import latency_summary
+
+CHILD = """
+import json, time, socket, asyncio
+
+connects = []
+_connect = socket.socket.connect
+def connect(self, address):
+    connects.append(str(address))
+    return _connect(self, address)
+socket.socket.connect = connect
+
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def lifespan():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+started = asyncio.run(lifespan())
+print(json.dumps({"import": imported - start, "lifespan": started - imported, "connects": connects}))
+"""
+
+
+def run_once() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    imports = latency_summary([r["import"] for r in runs])
+    lifespans = latency_summary([r["lifespan"] for r in runs])
+    totals = latency_summary([r["import"] + r["lifespan"] for r in runs])
+    connects = sorted({address for r in runs for address in r["connects"]})
+    print(
+        f"{args.runs} cold starts | import p50 {imports['p50']:.0f}ms | lifespan startup p50 {lifespans['p50']:.1f}ms | "
+        f"total p50 {totals['p50']:.0f}ms, max {totals['max']:.0f}ms"
+    )
+    print(f"network connections during startup: {len(connects)}" + (f" ({', '.join(connects)})" if connects else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,33 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.auth import router as auth_router
 from app.routes.chat import router as chat_router
 from app.canvas_api import get_user_profile, get_courses
+from app.clients import clients
+from app.utils.executor import shutdown_process_pool
+from app.utils import metrics
 from app.routes import ingest
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start from an unbuilt registry, closing anything built before startup (at import,
+    # or by a previous app in this process); clients connect on first use after that
+    await clients.aclose()
+    app.state.clients = clients
+    ingest.sync_scheduler.start()
+    yield
+    await ingest.sync_scheduler.stop()
+    await ingest.ingest_jobs.stop()
+    # Close the pooled OpenAI, Canvas, memory-store and vector-store connections on shutdown
+    await clients.aclose()
+    shutdown_process_pool()
 
-app = FastAPI(title="Canvas AI Buddy",debug=True)
+
+app = FastAPI(title="Canvas AI Buddy",debug=True, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,6 +37,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    """Request latency histogram, plus a Server-Timing header listing the request's spans when enabled"""
+    start = time.perf_counter()
+    with metrics.request_timings() as timings:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    route = request.scope.get("route")
+    metrics.observe(
+        "http_request_seconds", elapsed,
+        method=request.method, route=getattr(route, "path", "unmatched"), status=str(response.status_code),
+    )
+    if metrics.SERVER_TIMING:
+        response.headers["Server-Timing"] = metrics.server_timing_header(timings + [("total", elapsed)])
+    return response
+
+
 app.include_router(auth_router)
 app.include_router(chat_router)
 app.include_router(ingest.router)
@@ -35,3 +73,9 @@ async def me():
 @app.get("/courses")
 async def courses():
     return await get_courses()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage latencies, request latencies and token/byte counters in Prometheus text format"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -1,24 +1,72 @@
 import axios from "axios";
 
+const API_BASE_URL = "http://localhost:8000"; // Replace with production backend URL in deployment
+
 const API = axios.create({
-  baseURL: "http://localhost:8000", // Replace with production backend URL in deployment
+  baseURL: API_BASE_URL,
 });
 
 // Generate a unique session ID per browser session
 const sessionId = crypto.randomUUID();
 
 /**
- * Send a chat message to the FastAPI backend
+ * Parse one Server-Sent Events frame into { event, data }
+ * @param {string} frame
+ */
+const parseSseFrame = (frame) => {
+  let event = "message";
+  const dataLines = [];
+  for (const line of frame.split("\n")) {
+    if (line.startsWith("event:")) event = line.slice(6).trim();
+    else if (line.startsWith("data:")) dataLines.push(line.slice(5).trim());
+  }
+  return { event, data: dataLines.length ? JSON.parse(dataLines.join("\n")) : {} };
+};
+
+/**
+ * Send a chat message to the FastAPI backend and stream the answer back.
+ * Uses fetch instead of axios because axios can't read a streamed body in the browser.
  * @param {number} courseId
  * @param {string} message
+ * @param {(token: string) => void} [onToken] called with each chunk of the answer as it arrives
  */
-export const sendChat = async (courseId, message) => {
-  const res = await API.post("/chat", {
-    course_id: courseId,
-    session_id: sessionId,
-    message,
+export const sendChat = async (courseId, message, onToken) => {
+  const res = await fetch(`${API_BASE_URL}/chat/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      course_id: courseId,
+      session_id: sessionId,
+      message,
+    }),
   });
-  return res.data;
+  if (!res.ok || !res.body) {
+    throw new Error(`Chat request failed (${res.status})`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let answer = "";
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    const frames = buffer.split("\n\n");
+    buffer = frames.pop();
+    for (const frame of frames) {
+      const { event, data } = parseSseFrame(frame);
+      if (event === "error") throw new Error(data.detail);
+      if (event === "done") return { answer: data.answer };
+      if (data.token) {
+        answer += data.token;
+        onToken?.(data.token);
+      }
+    }
+  }
+  return { answer };
 };
 
 /**
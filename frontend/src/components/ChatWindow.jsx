@@ -19,10 +19,27 @@ export default function ChatWindow({ course, onBack }) {
     setInput("");
     setIsTyping(true);
 
+    // Append the assistant bubble on the first token, then grow it in place
+    let streaming = false;
+    const appendToken = (token) => {
+      if (!streaming) {
+        streaming = true;
+        setIsTyping(false);
+        setMessages((prev) => [...prev, { role: "assistant", content: token }]);
+        return;
+      }
+      setMessages((prev) => {
+        const last = prev[prev.length - 1];
+        return [...prev.slice(0, -1), { ...last, content: last.content + token }];
+      });
+    };
+
     try {
-      const res = await sendChat(course.id, input);
-      const botMsg = { role: "assistant", content: res.answer || "..." };
-      setMessages((prev) => [...prev, botMsg]);
+      const res = await sendChat(course.id, input, appendToken);
+      if (!streaming) {
+        const botMsg = { role: "assistant", content: res.answer || "..." };
+        setMessages((prev) => [...prev, botMsg]);
+      }
     } catch {
       const errorMsg = {
         role: "assistant",